@@ -21,10 +21,25 @@
 
 
 from .timer import Timer
+from .wall import WallTimer
 from .countdown import Countdown
 from .general import parse_time, measure_time, measure_duration, after
-from .loop import loop, interactiveloop
+from .loop import loop, interactiveloop, budgetloop
 from .event import Event
+from .fdevent import FdEvent
+from .coalesce import Coalescer
+from .barrier import PreciseBarrier
+from .control import ControlServer, ControlClient
+from .clocksync import ClockServer, ClockClient
+from .metrics import MetricsExporter
+from .cputime import CpuBreakdown
+from .playback import Playback
+from .recorder import TickRecorder, read_ticks
+from .pipeline import Pipeline, Stage
+from .executive import Executive
+from .watchdog import Watchdog
+from .schedule import Calendar, Scheduler
+from .ratelimit import TokenBucket, LeakyBucket, GCRA
 
 # from importlib.metadata import version (only for python 3.8+)
 from importlib_metadata import version
@@ -20,20 +20,58 @@
 # If not, see <https://www.gnu.org/licenses/>
 
 
+import os
+import sys
 import argparse
 
 from .countdown import Countdown
 
 
-descr = "GUI countdown clock based on the oclock module."
+def _has_display():
+    """Whether a tkinter window can be opened (tkinter installed, X/Wayland)."""
+    try:
+        import tkinter   # noqa
+    except ImportError:
+        return False
+    if sys.platform.startswith('linux'):
+        return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+    return True
 
-parser = argparse.ArgumentParser(description=descr,
-                                 formatter_class=argparse.RawTextHelpFormatter)
 
-msg = "Input time in hh:mm:ss format, e.g. 10:30:00, or ::5 (5 seconds)"
+def countdown(argv=None):
+    """Start countdown, e.g. python -m oclock ::5 (-t for terminal)"""
+    descr = "GUI or terminal countdown clock based on the oclock module."
 
-# The nargs='?' is to have a positional argument with a default value
-parser.add_argument('time', type=str, nargs='?', help=msg)
+    parser = argparse.ArgumentParser(description=descr,
+                                     formatter_class=argparse.RawTextHelpFormatter)
 
-args = parser.parse_args()
-countdown = Countdown(args.time)
+    msg = "Input time in hh:mm:ss format, e.g. 10:30:00, or ::5 (5 seconds)"
+
+    # The nargs='?' is to have a positional argument with a default value
+    parser.add_argument('time', type=str, nargs='?', help=msg)
+
+    msg = "Display countdown in the terminal instead of a GUI window\n" \
+          "(default if no display is available, e.g. through SSH)"
+    parser.add_argument('-t', '--terminal', action='store_true', help=msg)
+
+    args = parser.parse_args(argv)
+    Countdown(args.time, terminal=args.terminal or not _has_display())
+
+
+def main(argv=None):
+    """Dispatch subcommands; without subcommand, start a GUI countdown.
+
+    - python -m oclock [countdown] ::5
+    - python -m oclock run -i 0.1 -- command (see oclock.runner)
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'run':
+        from .runner import main as run
+        run(argv[1:])
+    elif argv and argv[0] == 'countdown':
+        countdown(argv[1:])
+    else:
+        countdown(argv)
+
+
+main()
@@ -0,0 +1,134 @@
+"""Barrier releasing many threads at the same precise instant."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import time
+import threading
+
+
+class PreciseBarrier:
+    """Release parties threads together at an absolute deadline.
+
+    Threads call wait(deadline); they are released when all parties have
+    arrived and the deadline (time.perf_counter() reference) is reached,
+    whichever comes last. The last thread to arrive coordinates the release:
+    it sleeps until shortly before the deadline, spins on the clock until
+    the deadline, then releases all other threads at once, which are blocked
+    on individual locks (default) or spinning on a shared flag (spin_all).
+    Release skew between threads is then limited by the wakeup of threads
+    (and the GIL) instead of by the overshoot of individual sleeps.
+    The barrier can be reused (generations).
+    """
+
+    def __init__(self, parties, spin=0.002, spin_all=False):
+        """Init PreciseBarrier object.
+
+        Parameters
+        ----------
+        parties : int
+            number of threads that must call wait() to release the barrier
+
+        spin : float
+            duration (s) of the final busy-wait before the deadline (must be
+            larger than the typical sleep overshoot, i.e. ~1 ms)
+
+        spin_all : bool
+            if True, all threads (not only the coordinator) busy-wait during
+            the last spin seconds, on a shared flag; uses more CPU, and is
+            only useful on multi-core free-threaded (no-GIL) Python builds.
+        """
+        if parties < 1:
+            raise ValueError('parties must be at least 1')
+        self.parties = parties
+        self.spin = spin
+        self.spin_all = spin_all
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._generation = self._new_generation()
+
+    def __repr__(self):
+        """Str representation of PreciseBarrier object"""
+        s = "{}, parties {}, waiting {}, spin {}s" \
+            .format(self.__class__, self.parties, len(self._waiters), self.spin)
+        return s
+
+    @staticmethod
+    def _new_generation():
+        # armed: set when all parties have arrived; released: shared flag
+        return {'armed': threading.Event(), 'released': False, 'deadline': None}
+
+    @property
+    def n_waiting(self):
+        """Number of threads currently waiting at the barrier."""
+        return len(self._waiters)
+
+    def wait(self, deadline):
+        """Wait for all parties and for deadline; return release time.
+
+        Parameters
+        ----------
+        deadline : float
+            absolute release time in the time.perf_counter() reference
+            (the deadline passed by the last arriving thread is used)
+
+        Returns
+        -------
+        float
+            time.perf_counter() value read just after release
+        """
+        pc = time.perf_counter
+
+        waiter = threading.Lock()
+        waiter.acquire()
+
+        with self._lock:
+            generation = self._generation
+            if len(self._waiters) + 1 == self.parties:  # last: coordinator
+                waiters = self._waiters
+                self._waiters = []
+                self._generation = self._new_generation()
+                generation['deadline'] = deadline
+                coordinator = True
+            else:
+                self._waiters.append(waiter)
+                coordinator = False
+
+        if coordinator:
+            remaining = deadline - self.spin - pc()
+            if remaining > 0:
+                time.sleep(remaining)
+            generation['armed'].set()   # spin_all: waiters start spinning
+            while pc() < deadline:
+                pass
+            generation['released'] = True
+            for waiter in waiters:
+                waiter.release()
+            return pc()
+
+        if self.spin_all:
+            generation['armed'].wait()
+            released = generation
+            while not released['released']:
+                pass
+            return pc()
+
+        waiter.acquire()
+        return pc()
@@ -0,0 +1,279 @@
+"""Estimate offset and drift between clocks of processes or hosts (NTP-like)."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import os
+import sys
+import time
+import socket
+import struct
+import itertools
+from collections import deque
+from threading import Thread, Lock
+
+from .timer import Timer
+from .control import _parse_address
+
+
+# ================================ Protocol ==================================
+
+# Probes are datagrams (UDP or Unix) containing a sequence number and the
+# client send time t1; the server answers with t1, its receive time t2 and
+# its send time t3. The client notes the receive time t4 (all times in ns).
+# offset = ((t2 - t1) + (t3 - t4)) / 2  (peer clock - local clock)
+# delay = (t4 - t1) - (t3 - t2)         (round-trip time on the network)
+request_format = struct.Struct('<Qq')
+reply_format = struct.Struct('<Qqqq')
+
+
+# =============================== Server class ===============================
+
+
+class ClockServer:
+    """Answer timestamped probes of ClockClients, in a single thread."""
+
+    def __init__(self, address=('127.0.0.1', 0), clock=time.time_ns):
+        """Init ClockServer object (answers probes after start()).
+
+        Parameters
+        ----------
+        address : str or tuple
+            - path (str) of a Unix datagram socket (for local processes)
+            - 'host:port' (str) or (host, port) (tuple) for UDP; default is
+              localhost with a port chosen by the system (see self.address)
+
+        clock : callable
+            clock returning times in ns (default time.time_ns, i.e. unix time
+            as in measure_time()); can be replaced e.g. for tests
+        """
+        family, address = _parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.remove(address)  # remove stale socket file
+        self.family = family
+        self.clock = clock
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+        self._socket.bind(address)
+        self.address = self._socket.getsockname()
+        self.is_running = False
+        self.probes = 0   # number of probes answered
+        self._thread = None
+
+    def __repr__(self):
+        """Str representation of ClockServer object"""
+        s = "{}, address {}, {} probes answered" \
+            .format(self.__class__, self.address, self.probes)
+        return s
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _serve(self):
+        sock = self._socket
+        clock = self.clock
+        pack = reply_format.pack
+        unpack = request_format.unpack
+        while self.is_running:
+            try:
+                data, client = sock.recvfrom(64)
+                t2 = clock()
+                if len(data) != request_format.size or not client:
+                    continue   # e.g. wakeup datagram sent by stop()
+                seq, t1 = unpack(data)
+                sock.sendto(pack(seq, t1, t2, clock()), client)
+            except OSError:
+                # e.g. client socket closed before the reply: skip probe
+                continue
+            self.probes += 1
+
+    def start(self):
+        """Answer probes in a separate (daemon) thread."""
+        self.is_running = True
+        self._thread = Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop answering probes and close socket."""
+        if self.is_running:
+            self.is_running = False
+            with socket.socket(self.family, socket.SOCK_DGRAM) as sock:
+                sock.sendto(b'', self.address)   # wake up server thread
+            self._thread.join()
+        self._socket.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+# =============================== Client class ===============================
+
+
+class ClockClient:
+    """Estimate offset and drift of the clock of a ClockServer (peer).
+
+    Probes are sent in bursts (sync()); only the sample with the minimum
+    round-trip time of each burst is kept, since it is the least affected by
+    queuing delays. A linear model offset(t) = offset + drift * (t - t_ref)
+    is fitted on the last history kept samples, with t the local time.
+    """
+
+    def __init__(self, address, history=32, timeout=0.1, clock=time.time_ns):
+        """Init ClockClient object.
+
+        Parameters
+        ----------
+        address : str or tuple
+            address of the ClockServer (see ClockServer)
+
+        history : int
+            number of (minimum-RTT) samples used to fit the offset model
+
+        timeout : float
+            time (s) after which a probe is considered lost
+
+        clock : callable
+            local clock returning times in ns (default time.time_ns)
+        """
+        family, address = _parse_address(address)
+        self.address = address
+        self.clock = clock
+        self.samples = deque(maxlen=history)  # (local time, offset, delay) (s)
+        self.lost = 0       # number of probes lost (timeout)
+
+        # model, see offset_at()
+        self.t_ref = None
+        self.offset = None   # offset (s) at t_ref
+        self.drift = 0.      # drift (s/s) of peer clock w.r.t. local clock
+        self.delay = None    # min round-trip time (s) of kept samples
+
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+        if family == socket.AF_UNIX:
+            self._socket.bind('' if sys.platform.startswith('linux') else
+                              '{}.{}.client'.format(address, os.getpid()))
+        self._socket.settimeout(timeout)
+        self._seq = itertools.count()
+        self._lock = Lock()   # one burst at a time
+        self._timer = None
+
+    def __repr__(self):
+        """Str representation of ClockClient object"""
+        s = "{}, peer {}, offset {}s, drift {}, {} samples" \
+            .format(self.__class__, self.address, self.offset, self.drift,
+                    len(self.samples))
+        return s
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def probe(self):
+        """Single probe; return (local time, offset, delay) in s, or None."""
+        sock = self._socket
+        clock = self.clock
+        seq = next(self._seq)
+        t1 = clock()
+        sock.sendto(request_format.pack(seq, t1), self.address)
+        try:
+            while True:
+                data = sock.recv(64)
+                t4 = clock()
+                if len(data) == reply_format.size:
+                    seq_back, t1_back, t2, t3 = reply_format.unpack(data)
+                    if seq_back == seq:
+                        break   # else: late answer to a previous (lost) probe
+        except socket.timeout:
+            self.lost += 1
+            return None
+        offset = ((t2 - t1) + (t3 - t4)) / 2
+        delay = (t4 - t1) - (t3 - t2)
+        return (t1 + t4) / 2 * 1e-9, offset * 1e-9, delay * 1e-9
+
+    def sync(self, n=8):
+        """Send a burst of n probes, keep the min-RTT one, update model.
+
+        Returns the current offset estimate (s), peer time - local time.
+        """
+        with self._lock:
+            results = [r for r in (self.probe() for _ in range(n)) if r]
+            if results:
+                self.samples.append(min(results, key=lambda r: r[2]))
+                self._fit()
+        return self.offset
+
+    def _fit(self):
+        """Fit linear offset model on kept samples (weighted by RTT)."""
+        import numpy as np   # only needed for the model fit
+
+        t, offsets, delays = np.array(self.samples).T
+        t_ref = t[-1]
+        self.delay = delays.min()
+        if len(t) < 3 or t[-1] - t[0] <= 0:
+            self.t_ref, self.offset, self.drift = t_ref, offsets[-1], 0.
+            return
+        # samples with larger RTT have larger uncertainty on the offset
+        weights = 1 / np.maximum(delays, 1e-7)
+        drift, offset = np.polyfit(t - t_ref, offsets, 1, w=weights)
+        self.t_ref, self.offset, self.drift = t_ref, offset, drift
+
+    @property
+    def uncertainty(self):
+        """Max error (s) on the offset, from the min round-trip time."""
+        return None if self.delay is None else self.delay / 2
+
+    def offset_at(self, times):
+        """Offset (s) at local unix time(s) (float or numpy array)."""
+        if self.offset is None:
+            raise ValueError('No offset estimate yet, call sync() first')
+        return self.offset + self.drift * (times - self.t_ref)
+
+    def to_peer(self, times):
+        """Convert local unix times (float or numpy array) to peer clock."""
+        return times + self.offset_at(times)
+
+    def from_peer(self, times):
+        """Convert peer unix times (float or numpy array) to local clock."""
+        if self.offset is None:
+            raise ValueError('No offset estimate yet, call sync() first')
+        return (times - self.offset + self.drift * self.t_ref) / (1 + self.drift)
+
+    def _sync_periodically(self, n):
+        timer = self._timer
+        while not timer.is_stopped:
+            self.sync(n)
+            timer.checkpt()
+
+    def start(self, interval=1, n=8):
+        """Sync every interval (s) in a separate (daemon) thread."""
+        self._timer = Timer(interval=interval, name='ClockClient')
+        Thread(target=self._sync_periodically, args=(n,), daemon=True).start()
+
+    def stop(self):
+        """Stop periodic sync."""
+        if self._timer is not None:
+            self._timer.stop()
+
+    def close(self):
+        self.stop()
+        self._socket.close()
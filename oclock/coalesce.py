@@ -0,0 +1,175 @@
+"""Coalescing of the wakeups of timers with slack (see Timer(slack=...))."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import time
+import heapq
+import itertools
+from threading import Thread, Condition
+
+
+class _Wakeup:
+    """Pending release of a waiting timer."""
+
+    __slots__ = ('deadline', 'latest', 'event', 'is_active')
+
+    def __init__(self, deadline, latest, event):
+        self.deadline = deadline
+        self.latest = latest
+        self.event = event
+        self.is_active = True
+
+
+class Coalescer:
+    """Release timers with slack together, with a single thread wakeup.
+
+    A timer with slack s accepts to be released anywhere between its
+    scheduled time t and t + s. Instead of sleeping on its own, it registers
+    its window with the coalescer, whose thread sleeps until the end of the
+    earliest window (min of t + s), then releases at once all timers whose
+    scheduled time has been reached. This minimizes the number of wakeups
+    while never releasing a timer before its scheduled time or after the end
+    of its window (apart from thread wakeup latency). Scheduled times, i.e.
+    the drift-free grids of the timers, are not modified: only releases are
+    delayed, by at most the slack.
+
+    A process-wide coalescer is used by default, see get_coalescer().
+    """
+
+    def __init__(self):
+        self._heap = []                    # (latest, sequence number, wakeup)
+        self._pending = set()              # active wakeups
+        self._counter = itertools.count()  # avoids comparing wakeups in heap
+        self._condition = Condition()
+        self._thread = None
+
+        # counters, see stats()
+        self.waits = 0       # timer waits handled
+        self.wakeups = 0     # wakeups of the coalescer thread releasing timers
+        self.released = 0    # timers released by the coalescer
+        self.lateness = 0.   # sum of release - scheduled time (s)
+        self.max_lateness = 0.
+
+    def __repr__(self):
+        """Str representation of Coalescer object"""
+        s = "{}, {} pending, {} released in {} wakeups" \
+            .format(self.__class__, len(self._pending), self.released,
+                    self.wakeups)
+        return s
+
+    def _run(self):
+        pc = time.perf_counter
+        heap = self._heap
+        pending = self._pending
+        with self._condition:
+            while True:
+                if not heap:
+                    self._condition.wait()
+                    continue
+                latest, _, wakeup = heap[0]
+                if not wakeup.is_active:  # released or cancelled
+                    heapq.heappop(heap)
+                    continue
+                now = pc()
+                if now < latest:
+                    self._condition.wait(latest - now)
+                    continue
+                # release all timers that have reached their scheduled time
+                released = [w for w in pending if w.deadline <= now]
+                for wakeup in released:
+                    wakeup.is_active = False
+                    wakeup.event.set()
+                    pending.remove(wakeup)
+                    lateness = now - wakeup.deadline
+                    self.lateness += lateness
+                    if lateness > self.max_lateness:
+                        self.max_lateness = lateness
+                self.released += len(released)
+                self.wakeups += 1
+
+    def wait(self, event, deadline, slack):
+        """Wait until released between deadline and deadline + slack.
+
+        Parameters
+        ----------
+        event : Event-like
+            event on which the caller waits, set by the coalescer at release
+            (it can also be set by others, e.g. Timer.stop(), to cancel)
+
+        deadline : float
+            scheduled time (time.perf_counter() reference)
+
+        slack : float
+            max delay (s) of release after deadline
+        """
+        wakeup = _Wakeup(deadline, deadline + slack, event)
+        with self._condition:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self.waits += 1
+            self._pending.add(wakeup)
+            heap = self._heap
+            heapq.heappush(heap, (wakeup.latest, next(self._counter), wakeup))
+            if heap[0][2] is wakeup:  # earlier release than planned
+                self._condition.notify()
+        event.wait()
+        # event set by someone else (cancellation): the coalescer must not
+        # set it again later, since it will be cleared by the caller
+        if wakeup.is_active:
+            with self._condition:
+                if wakeup.is_active:
+                    wakeup.is_active = False
+                    self._pending.discard(wakeup)
+
+    def stats(self):
+        """Number of wakeups saved and lateness added by coalescing.
+
+        Returns
+        -------
+        dict
+            waits, released, wakeups, wakeups_saved (released - wakeups),
+            mean_lateness and max_lateness (s) of releases
+        """
+        with self._condition:
+            released = self.released
+            mean = self.lateness / released if released else 0.
+            return {'waits': self.waits,
+                    'released': released,
+                    'wakeups': self.wakeups,
+                    'wakeups_saved': released - self.wakeups,
+                    'mean_lateness': mean,
+                    'max_lateness': self.max_lateness}
+
+    def reset_stats(self):
+        """Reset counters of stats()."""
+        with self._condition:
+            self.waits = self.wakeups = self.released = 0
+            self.lateness = self.max_lateness = 0.
+
+
+# process-wide coalescer (its thread is only started at the first wait)
+_default_coalescer = Coalescer()
+
+
+def get_coalescer():
+    """Process-wide Coalescer used by timers with slack by default."""
+    return _default_coalescer
@@ -0,0 +1,326 @@
+"""Socket-based control of many timers from a single thread."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import os
+import socket
+import traceback
+import selectors
+from threading import Thread, Lock
+
+from .loop import command
+
+
+# ================================ Protocol ==================================
+
+# Requests are single text lines of the form '<name> <command>', where name
+# is the name under which a timer has been registered (or '*' for all timers)
+# and command is any command accepted by oclock.loop.command(), e.g.
+# 'p', 'resume', 'status', '0.5'. The special request 'list' returns the names
+# of all registered timers. Each request gets exactly one line as an answer.
+
+encoding = 'utf-8'
+
+
+def _parse_address(address):
+    """Return (family, address) from str 'host:port', path, or tuple."""
+    if isinstance(address, tuple):
+        return socket.AF_INET, address
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    return socket.AF_UNIX, address
+
+
+# =============================== Server class ===============================
+
+
+class ControlServer:
+    """Control server for many timers, multiplexed in a single thread."""
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        """Init ControlServer object (server starts with start()).
+
+        Parameters
+        ----------
+        address : str or tuple
+            - path (str) of a Unix domain socket, e.g. '/tmp/oclock.sock'
+            - 'host:port' (str) or (host, port) (tuple) for TCP; default is
+              localhost with a port chosen by the system (see self.address)
+        """
+        family, address = _parse_address(address)
+        self.family = family
+        self.timers = {}
+        self._lock = Lock()
+
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.remove(address)  # remove stale socket file
+
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(address)
+        self._socket.listen()
+        self._socket.setblocking(False)
+        self.address = self._socket.getsockname()
+
+        # used to wake up the selector thread when stopping the server
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._socket, selectors.EVENT_READ, None)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+        self._thread = None
+        self.is_running = False
+
+    def __repr__(self):
+        """Str representation of ControlServer object"""
+        s = "{}, address {}, timers {}" \
+            .format(self.__class__, self.address, list(self.timers))
+        return s
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def register(self, timer, name=None):
+        """Make timer controllable from the server, under name (or timer.name)"""
+        name = timer.name if name is None else name
+        if ' ' in name:
+            raise ValueError('Timer name cannot contain spaces: {}'.format(name))
+        with self._lock:
+            if name in self.timers:
+                raise ValueError('Timer name already registered: {}'.format(name))
+            self.timers[name] = timer
+
+    def unregister(self, name, timer=None):
+        """Remove timer of given name from the server.
+
+        If timer is provided, the name is removed only if it is still
+        registered for that timer.
+        """
+        with self._lock:
+            if timer is None or self.timers.get(name) is timer:
+                self.timers.pop(name, None)
+
+    def start(self):
+        """Start server in a separate thread."""
+        self.is_running = True
+        self._thread = Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop server and close all connections."""
+        self.is_running = False
+        self._wakeup_w.send(b'\0')
+        if self._thread is not None:
+            self._thread.join()
+
+    def answer(self, request):
+        """Return answer (str) to a request line (see Protocol above)."""
+        words = request.split(maxsplit=1)
+        if not words:
+            return ''
+        if words == ['list']:
+            with self._lock:
+                return ' '.join(self.timers)
+        if len(words) < 2:
+            return '--- Invalid Request'
+
+        name, cmd = words
+        with self._lock:
+            if name == '*':
+                timers = list(self.timers.values())
+            elif name in self.timers:
+                timers = [self.timers[name]]
+            else:
+                return '--- Unknown Timer {}'.format(name)
+
+        answers = [command(timer, cmd) for timer in timers]
+        if None in answers:
+            return '--- Invalid Command'
+        return ' ; '.join(answers)
+
+    def _serve(self):
+        """Selector loop managing all connections (run in separate thread)."""
+        selector = self._selector
+        try:
+            while self.is_running:
+                for key, mask in selector.select():
+                    sock = key.fileobj
+                    if sock is self._socket:
+                        self._accept()
+                    elif sock is self._wakeup_r:
+                        sock.recv(1)
+                    else:
+                        try:
+                            self._exchange(key, mask)
+                        except Exception:  # only affects this connection
+                            traceback.print_exc()
+                            if sock.fileno() >= 0:
+                                self._close(sock)
+        finally:
+            for key in list(selector.get_map().values()):
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+            selector.close()
+            self._wakeup_w.close()
+            if self.family == socket.AF_UNIX:
+                os.remove(self.address)
+
+    def _accept(self):
+        try:
+            conn, _ = self._socket.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        buffers = {'in': b'', 'out': b''}
+        self._selector.register(conn, selectors.EVENT_READ, buffers)
+
+    def _close(self, conn):
+        self._selector.unregister(conn)
+        conn.close()
+
+    def _exchange(self, key, mask):
+        """Read requests from / write answers to a client connection."""
+        conn, buffers = key.fileobj, key.data
+
+        if mask & selectors.EVENT_READ:
+            try:
+                data = conn.recv(4096)
+            except ConnectionError:
+                data = b''
+            if not data:
+                self._close(conn)
+                return
+            buffers['in'] += data
+            *lines, buffers['in'] = buffers['in'].split(b'\n')
+            for line in lines:
+                request = line.decode(encoding, errors='replace')
+                try:
+                    answer = self.answer(request)
+                except Exception as error:
+                    answer = '--- Error: {!r}'.format(error)
+                buffers['out'] += (answer + '\n').encode(encoding)
+
+        if buffers['out']:
+            try:
+                sent = conn.send(buffers['out'])
+            except BlockingIOError:
+                sent = 0
+            except ConnectionError:
+                self._close(conn)
+                return
+            buffers['out'] = buffers['out'][sent:]
+
+        events = selectors.EVENT_READ
+        if buffers['out']:
+            events |= selectors.EVENT_WRITE
+        if events != key.events:
+            self._selector.modify(conn, events, buffers)
+
+
+# =============================== Client class ===============================
+
+
+class ControlClient:
+    """Client to send commands to timers registered in a ControlServer."""
+
+    def __init__(self, address, timeout=5):
+        """Init ControlClient object and connect to server.
+
+        Parameters
+        ----------
+        address : str or tuple
+            address of the server (see ControlServer), e.g. server.address
+
+        timeout : float
+            timeout (s) for connection and answers
+        """
+        family, address = _parse_address(address)
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(address)
+        self._file = self._socket.makefile('r', encoding=encoding)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def request(self, line):
+        """Send raw request line to server and return answer (str)."""
+        self._socket.sendall((line.strip() + '\n').encode(encoding))
+        return self._file.readline().rstrip('\n')
+
+    def send(self, name, cmd):
+        """Send command (e.g. 'pause', '0.5') to timer of given name."""
+        return self.request('{} {}'.format(name, cmd))
+
+    def list(self):
+        """Return names of timers registered in the server."""
+        return self.request('list').split()
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+# ========================== Command line interface ==========================
+
+
+def main(argv=None):
+    """Command line client, e.g. python -m oclock.control /tmp/oc.sock t1 p"""
+    import argparse   # only needed for the command line client
+
+    descr = "Send commands to timers registered in an oclock ControlServer."
+    parser = argparse.ArgumentParser(description=descr)
+
+    parser.add_argument('address', type=str,
+                        help="server address: socket path or host:port")
+    parser.add_argument('name', type=str, nargs='?',
+                        help="timer name ('*' for all); omit to list timers")
+    parser.add_argument('command', type=str, nargs='?',
+                        help="command (e.g. p, r, R, t, s, q or new interval);"
+                             " omit for interactive mode")
+
+    args = parser.parse_args(argv)
+
+    with ControlClient(args.address) as client:
+        if args.name is None:
+            print('\n'.join(client.list()))
+        elif args.command is not None:
+            print(client.send(args.name, args.command))
+        else:
+            try:
+                while True:
+                    print(client.send(args.name, input()))
+            except (EOFError, KeyboardInterrupt):
+                pass
+
+
+if __name__ == '__main__':
+    main()
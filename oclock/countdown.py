@@ -20,7 +20,7 @@
 # If not, see <https://www.gnu.org/licenses/>
 
 
-import tkinter as tk
+import sys
 from datetime import timedelta
 
 from threading import Thread
@@ -38,6 +38,11 @@ textcolor = '#f7f7f7'
 donecolor = '#64d253'
 overduecolor = '#ff4c4c'
 
+# ANSI escape sequences for terminal display
+ansi_colors = {'done': '\033[1;32m', 'overdue': '\033[1;31m'}
+ansi_reset = '\033[0m'
+ansi_clear_line = '\r\033[K'
+
 
 # =========================== Basic clock function ===========================
 
@@ -51,13 +56,24 @@ def clock(timer, total_time, queue):
         queue.put(time_remaining)
 
 
+def state(time_remaining):
+    """State of countdown: 'counting', 'done' (for 5 s) or 'overdue'."""
+    seconds = time_remaining.total_seconds()
+    if seconds > 0:
+        return 'counting'
+    elif seconds <= -5:
+        return 'overdue'
+    else:
+        return 'done'
+
+
 # =========================== Main Countdown Class ===========================
 
 
 class Countdown:
-    """GUI Countdown timer."""
+    """GUI (or terminal) Countdown timer."""
 
-    def __init__(self, time_str):
+    def __init__(self, time_str, terminal=False, stream=None):
         """Init of a Countdown object.
 
         Parameters
@@ -66,16 +82,28 @@ class Countdown:
             time to count, in h:m:s format
             (e.g. ::5 for 5 seconds, or 1:30: for 1.5 hours)
             see oclock.parse_time() for details.
+
+        terminal : bool
+            if True, display countdown in the terminal (updated in place,
+            once per second) instead of a tkinter window; stops with Ctrl+C
+
+        stream : file-like object
+            where the terminal countdown is written (default: sys.stdout)
         """
         self.total_time = parse_time(time_str)   # timedelta
-        self.timer = Timer(interval=0.2)     # check remaining time every 0.2s
-
-        self.root = tk.Tk()
-        self.queue = Queue()  # queue that gets the values of remaining time
         self.done = False
 
-        Thread(target=clock, args=(self.timer, self.total_time, self.queue)).start()
-        self.gui()
+        if terminal:
+            self.stream = sys.stdout if stream is None else stream
+            self.timer = Timer(interval=1)   # display changes every second
+            self.terminal()
+        else:
+            import tkinter as tk   # only needed for GUI
+            self.root = tk.Tk()
+            self.timer = Timer(interval=0.2)  # check remaining time every 0.2s
+            self.queue = Queue()  # queue that gets the values of remaining time
+            Thread(target=clock, args=(self.timer, self.total_time, self.queue)).start()
+            self.gui()
 
     def __repr__(self):
         """Str representation of Countdown object"""
@@ -86,6 +114,8 @@ class Countdown:
 
     def gui(self):
         """Set up and start GUI."""
+        import tkinter as tk
+
         self.root.geometry("150x75")  # Width x Height
         self.root.title("Timer")
         self.root.minsize(170, 40)
@@ -110,10 +140,10 @@ class Countdown:
 
         if t_remaining is not None:
 
-            if t_remaining.total_seconds() > 0:  # ----- timer still counting down
+            if state(t_remaining) == 'counting':  # ---- timer still counting down
                 self.display.config(text=str(t_remaining))
 
-            elif t_remaining.total_seconds() <= -5:  # ------------- timer overdue
+            elif state(t_remaining) == 'overdue':  # --------------- timer overdue
                 time_str = '- ' + str(-t_remaining)
                 self.display.config(text=time_str, fg=overduecolor)
 
@@ -125,3 +155,44 @@ class Countdown:
                     self.done = True
 
         self.root.after(100, self.update)  # update every 0.1 seconds
+
+# ============================= Terminal Methods =============================
+
+    def terminal(self):
+        """Display countdown in terminal until timer stopped or Ctrl+C."""
+        total = self.total_time.total_seconds()
+        timer = self.timer
+        self._text = None
+        timer.reset()
+        try:
+            while not timer.is_stopped:
+                t_remaining = timedelta(seconds=round(total - timer.elapsed_time))
+                self.render(t_remaining)
+                timer.checkpt()   # sleeps until next second boundary
+        except KeyboardInterrupt:
+            timer.stop()
+        self.stream.write('\n')
+        self.stream.flush()
+
+    def render(self, t_remaining):
+        """Write remaining time in place (only if displayed text changes)."""
+        status = state(t_remaining)
+        if status == 'counting':
+            text = str(t_remaining)
+        elif status == 'overdue':
+            text = '- ' + str(-t_remaining)
+        else:
+            text = 'Done!'
+
+        if text == self._text:
+            return
+        self._text = text
+
+        if status != 'counting' and self.stream.isatty():
+            text = ansi_colors[status] + text + ansi_reset
+        if status == 'done' and not self.done:
+            text += '\a'   # Sound alert
+            self.done = True
+
+        self.stream.write(ansi_clear_line + text)
+        self.stream.flush()
@@ -0,0 +1,167 @@
+"""Wall vs CPU time breakdown of loop bodies (overrun attribution)."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import time
+
+try:
+    import resource
+except ImportError:  # e.g. Windows
+    resource = None
+
+
+# causes to which overruns are attributed, see CpuBreakdown
+causes = ('cpu', 'waiting', 'scheduling')
+
+
+def context_switches():
+    """(voluntary, involuntary) context switches of calling thread, or None.
+
+    Voluntary switches happen when the thread blocks (I/O, locks, sleep),
+    involuntary ones when it is preempted by the scheduler. Only available
+    where getrusage supports RUSAGE_THREAD (Linux); returns None otherwise.
+    """
+    who = getattr(resource, 'RUSAGE_THREAD', None)
+    if who is None:
+        return None
+    usage = resource.getrusage(who)
+    return usage.ru_nvcsw, usage.ru_nivcsw
+
+
+class CpuBreakdown:
+    """Wall vs CPU time of loop bodies, updated by a timer at each checkpt.
+
+    Instances are used as timer hooks (see Timer.add_hook()), and must be
+    called from the thread running the loop (which is the case for hooks).
+    The loop body is the time between a checkpt release and the next
+    checkpt call; its CPU time is measured between the hook call after the
+    release and checkpt_entry() (called by the timer when the next checkpt
+    is called, before waiting), so that the wait itself is excluded (a
+    precise timer spins on CPU at the end of its waits). Each update reads
+    time.thread_time_ns() and time.process_time_ns(), plus getrusage() if
+    rusage is True, at entry and after release, and consists of a few
+    integer operations without lock.
+
+    Each overrun (checkpt called after its scheduled time) is attributed to
+    the main component of the body duration:
+    - 'cpu': the thread was computing most of the time
+    - 'waiting': the thread was off-CPU, blocked (I/O, locks, sleep etc.)
+    - 'scheduling': the thread was off-CPU, preempted (more involuntary than
+      voluntary context switches; needs rusage=True, otherwise off-CPU time
+      is always attributed to 'waiting')
+    """
+
+    __slots__ = ('rusage', 'ticks', 'overruns', 'wall_ns', 'cpu_ns',
+                 'process_cpu_ns', 'voluntary', 'involuntary', 'causes',
+                 'last', '_release', '_cpu', '_process_cpu', '_switches',
+                 '_entry')
+
+    def __init__(self, rusage=False):
+        """Init CpuBreakdown object.
+
+        Parameters
+        ----------
+        rusage : bool
+            if True, also count context switches (Linux only, see
+            context_switches()), to distinguish waiting from preemption
+        """
+        self.rusage = rusage and context_switches() is not None
+        self.ticks = 0           # number of loop bodies measured
+        self.overruns = 0
+        self.wall_ns = 0         # total wall time of loop bodies
+        self.cpu_ns = 0          # total thread CPU time of loop bodies
+        self.process_cpu_ns = 0  # total process CPU time (all threads)
+        self.voluntary = 0       # total context switches during loop bodies
+        self.involuntary = 0
+        self.causes = dict.fromkeys(causes, 0)  # number of overruns per cause
+        self.last = None         # (wall, cpu, process cpu) (s) of last body
+        self._release = None
+        self._entry = None       # (cpu, process cpu, switches) at entry
+
+    def __repr__(self):
+        """Str representation of CpuBreakdown object"""
+        s = "{}, {} ticks, {} overruns {}" \
+            .format(self.__class__, self.ticks, self.overruns, self.causes)
+        return s
+
+    def checkpt_entry(self):
+        """Record CPU times at end of body (called by the timer at checkpt)."""
+        self._entry = (time.thread_time_ns(), time.process_time_ns(),
+                       context_switches() if self.rusage else None)
+
+    def __call__(self, timer, entry, scheduled, release):
+        """Update statistics (called by the timer after each checkpt)."""
+        if self._release is not None and self._entry is not None:
+            cpu, process_cpu, switches = self._entry
+            wall = int((entry - self._release) * 1e9)
+            body_cpu = cpu - self._cpu
+            self.ticks += 1
+            self.wall_ns += wall
+            self.cpu_ns += body_cpu
+            self.process_cpu_ns += process_cpu - self._process_cpu
+            voluntary = involuntary = 0
+            if switches is not None:
+                voluntary = switches[0] - self._switches[0]
+                involuntary = switches[1] - self._switches[1]
+                self.voluntary += voluntary
+                self.involuntary += involuntary
+            if entry >= scheduled:
+                self.overruns += 1
+                if 2 * body_cpu >= wall:
+                    cause = 'cpu'
+                elif involuntary > voluntary:
+                    cause = 'scheduling'
+                else:
+                    cause = 'waiting'
+                self.causes[cause] += 1
+            self.last = wall * 1e-9, body_cpu * 1e-9, \
+                (process_cpu - self._process_cpu) * 1e-9
+
+        # start of next loop body
+        self._entry = None
+        self._release = release
+        self._cpu = time.thread_time_ns()
+        self._process_cpu = time.process_time_ns()
+        self._switches = context_switches() if self.rusage else None
+
+    def stats(self):
+        """Aggregated breakdown of loop bodies (times in s).
+
+        Returns
+        -------
+        dict
+            ticks, overruns, wall, cpu and process cpu total times, cpu
+            fraction (cpu / wall), context switches (if rusage), and number
+            of overruns attributed to each cause
+        """
+        wall = self.wall_ns * 1e-9
+        cpu = self.cpu_ns * 1e-9
+        stats = {'ticks': self.ticks,
+                 'overruns': self.overruns,
+                 'wall (s)': wall,
+                 'cpu (s)': cpu,
+                 'process cpu (s)': self.process_cpu_ns * 1e-9,
+                 'cpu fraction': cpu / wall if wall else 0.,
+                 'overrun causes': dict(self.causes)}
+        if self.rusage:
+            stats['voluntary switches'] = self.voluntary
+            stats['involuntary switches'] = self.involuntary
+        return stats
@@ -34,7 +34,7 @@ import datetime
 class Event:
     __slots__ = (
         "_flag", "_lock", "_nl",
-        "_pc", "_waiters"
+        "_pc", "_waiters", "_generation"
     )
 
     _lock_type = _thread.LockType
@@ -67,6 +67,8 @@ class Event:
     def set(self):
         with self._lock:
             self._flag(True)
+            # waiters wake up on the set itself, even if clear() follows
+            self._generation += 1
             waiters = self._waiters
 
             for waiter in waiters:
@@ -76,10 +78,15 @@ class Event:
 
     def wait(
         self,
-        timeout: float = None
+        timeout: float = None,
+        start: float = None
     ) -> bool:
+        # start (time.perf_counter() value) from which timeout is counted,
+        # can be passed by callers who already read the clock.
+        if self._flag._on:  # fast path, no need for lock
+            return True
         with self._lock:
-            return self._wait(self._pc(), timeout)
+            return self._wait(self._pc() if start is None else start, timeout)
 
     def _new_waiter(self) -> _lock_type:
         waiter = self._nl()
@@ -99,6 +106,7 @@ class Event:
         thread_delay=_timedelta(milliseconds=3)
     ) -> bool:
         flag = self._flag
+        generation = self._generation
 
         if flag:
             return True
@@ -115,7 +123,7 @@ class Event:
                 waiter = self._new_waiter()
                 new_thread(
                     self._wait_thread,
-                    (flag, mark, waiter)
+                    (generation, mark, waiter)
                 )
 
         lock = self._lock
@@ -127,7 +135,7 @@ class Event:
 
             if end:
                 while (
-                    not flag and
+                    self._generation == generation and
                     td(seconds=pc()) < end
                 ):
                     pass
@@ -135,30 +143,37 @@ class Event:
         finally:
             lock.acquire()
 
-            if waiter and not flag:
+            # waiter has been removed if released by set() or _wait_thread()
+            if waiter and waiter in self._waiters:
                 self._waiters.remove(waiter)
 
-        return flag()
+        # True if set during the wait, even if cleared since (threading.Event)
+        return flag() or self._generation != generation
 
-    @staticmethod
     def _wait_thread(
-        flag: _switch,
+        self,
+        generation: int,
         mark: _timedelta,
         waiter: _lock_type,
         td=_timedelta,
         pc=_perf_counter,
         sleep=time.sleep
     ):
-        while not flag and td(seconds=pc()) < mark:
+        while self._generation == generation and td(seconds=pc()) < mark:
             sleep(0.001)
 
-        if waiter.locked():
-            waiter.release()
+        # waiters are released (and removed) only with the lock acquired,
+        # so that set() and this thread never release the same waiter twice
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                waiter.release()
 
     def __new__(cls):
         _new_lock = cls._new_lock
         _self = object.__new__(cls)
         _self._waiters = []
+        _self._generation = 0
         _self._nl = _new_lock
         _self._lock = _new_lock()
         _self._flag = cls._switch()
@@ -0,0 +1,225 @@
+"""Multi-rate executive: tasks at harmonic rates driven by a single Timer."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+from threading import Thread
+
+from .timer import Timer
+
+
+class Task:
+    """Periodic task of an Executive (see Executive.add_task())."""
+
+    def __init__(self, function, divider=1, offset=0, offload=False,
+                 name=None, args=None, kwargs=None):
+        if divider < 1 or int(divider) != divider:
+            raise ValueError('Divider must be a positive integer')
+        if not 0 <= offset < divider:
+            raise ValueError('Offset must be between 0 and divider - 1')
+        self.function = function
+        self.divider = int(divider)
+        self.offset = int(offset)
+        self.offload = offload
+        self.name = getattr(function, '__name__', 'task') if name is None else name
+        self.args = () if args is None else args
+        self.kwargs = {} if kwargs is None else kwargs
+
+        # counters
+        self.runs = 0          # number of executions started
+        self.overruns = 0      # executions not finished within task period
+        self.skipped = 0       # activations skipped (missed frame or overrun)
+        self.busy_time = 0.    # total execution time (s), inline tasks only
+        self.max_duration = 0.  # max execution time (s), inline tasks only
+
+        self._future = None
+
+    def __repr__(self):
+        """Str representation of Task object"""
+        s = "{}, name '{}', divider {}, offset {}, offload {}" \
+            .format(self.__class__, self.name, self.divider, self.offset,
+                    self.offload)
+        return s
+
+    def is_due(self, frame):
+        """Whether task has to run in minor frame number frame."""
+        return frame % self.divider == self.offset
+
+    def stats(self):
+        return {'runs': self.runs, 'overruns': self.overruns,
+                'skipped': self.skipped, 'busy time (s)': self.busy_time,
+                'max duration (s)': self.max_duration}
+
+
+class Executive:
+    """Cyclic executive dispatching tasks at harmonic rates on one thread.
+
+    All tasks are aligned on the grid of a single base Timer (minor frames);
+    a task of divider n and offset k runs in frames k, k + n, k + 2n, etc.
+    Within a frame, tasks are executed by increasing divider (i.e. highest
+    rates first, rate-monotonic order), then in the order of registration.
+    """
+
+    def __init__(self, interval, name='Executive', warnings=False,
+                 precise=False, max_workers=None):
+        """Init Executive object (tasks are dispatched with run() or start()).
+
+        Parameters
+        ----------
+        interval : float
+            duration (s) of the minor frame, i.e. period of the fastest tasks
+
+        name, warnings, precise :
+            see oclock.Timer()
+
+        max_workers : int
+            max number of threads executing offloaded tasks
+            (see concurrent.futures.ThreadPoolExecutor)
+        """
+        self.timer = Timer(interval=interval, name=name, warnings=warnings,
+                           precise=precise)
+        self.tasks = []
+        self.max_workers = max_workers
+        self.frame = 0            # current minor frame number
+        self.frame_overruns = 0   # frames whose tasks took longer than interval
+        self.missed_frames = 0    # frames skipped because of overruns
+        self._thread = None
+
+    def __repr__(self):
+        """Str representation of Executive object"""
+        s = "{}, interval {}s, tasks {}" \
+            .format(self.__class__, self.timer.interval,
+                    [task.name for task in self.tasks])
+        return s
+
+    def add_task(self, function, divider=1, offset=0, offload=False,
+                 name=None, args=None, kwargs=None):
+        """Register function to be executed every divider frames.
+
+        Parameters
+        ----------
+        function : callable
+            function to execute periodically
+
+        divider : int
+            the task runs every divider minor frames (e.g. with a 1 ms
+            interval, divider=10 is a 100 Hz task and divider=1000 a 1 Hz task)
+
+        offset : int
+            phase offset (in frames, between 0 and divider - 1), e.g. to
+            spread slow tasks over different frames
+
+        offload : bool
+            if True, execute task in a thread pool instead of the dispatching
+            thread (useful for slow tasks); if the previous execution is not
+            finished when the task is due again, the activation is skipped
+            and counted as an overrun.
+
+        name : str
+            task name (default: function name)
+
+        args, kwargs : tuple, dict
+            arguments passed to function
+
+        Returns
+        -------
+        oclock.executive.Task
+        """
+        task = Task(function, divider=divider, offset=offset, offload=offload,
+                    name=name, args=args, kwargs=kwargs)
+        self.tasks.append(task)
+        self.tasks.sort(key=lambda task: task.divider)  # stable sort
+        return task
+
+    def _run_frame(self, frame, start, interval, pool):
+        """Execute all tasks due in frame; start is the frame scheduled time."""
+        now = self.timer.now
+        for task in self.tasks:
+            if not task.is_due(frame):
+                continue
+            if task.offload:
+                future = task._future
+                if future is not None and not future.done():
+                    task.overruns += 1
+                    task.skipped += 1
+                    continue
+                task.runs += 1
+                task._future = pool.submit(task.function, *task.args,
+                                           **task.kwargs)
+            else:
+                t0 = now()
+                task.runs += 1
+                task.function(*task.args, **task.kwargs)
+                t1 = now()
+                duration = t1 - t0
+                task.busy_time += duration
+                task.max_duration = max(task.max_duration, duration)
+                if t1 > start + task.divider * interval:
+                    task.overruns += 1
+        if now() > start + interval:
+            self.frame_overruns += 1
+
+    def _skip_frames(self, first, n):
+        """Account for activations in n missed frames starting at first."""
+        for task in self.tasks:
+            due = sum(1 for frame in range(first, first + n)
+                      if task.is_due(frame))
+            task.skipped += due
+
+    def run(self):
+        """Dispatch tasks (blocking) until stop() is called."""
+        timer = self.timer
+        self.frame = 0
+        # only needed when running
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            timer.reset()
+            first = True
+            for tick in timer.ticks():
+                if first:
+                    first = False
+                elif tick.missed:
+                    self._skip_frames(self.frame + 1, tick.missed)
+                    self.missed_frames += tick.missed
+                    self.frame += 1 + tick.missed
+                else:
+                    self.frame += 1
+                self._run_frame(self.frame, tick.scheduled, timer.interval, pool)
+
+    def start(self):
+        """Dispatch tasks in a separate thread."""
+        self._thread = Thread(target=self.run)
+        self._thread.start()
+
+    def stop(self):
+        """Stop dispatching tasks (waits for offloaded tasks to finish)."""
+        self.timer.stop()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """Counters of the executive and of each task (by name)."""
+        stats = {'executive': {'frames': self.frame + 1,
+                               'frame overruns': self.frame_overruns,
+                               'missed frames': self.missed_frames}}
+        for task in self.tasks:
+            stats[task.name] = task.stats()
+        return stats
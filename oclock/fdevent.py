@@ -0,0 +1,193 @@
+"""Event backed by a file descriptor, usable with select/poll/asyncio."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import os
+import math
+import time
+import select
+from threading import Lock
+
+
+class FdEvent:
+    """Event mimicking threading.Event, backed by a file descriptor.
+
+    The file descriptor (fileno()) is readable when the event is set, so that
+    the event can be waited on together with sockets etc. using select, poll,
+    selectors or asyncio (loop.add_reader), without helper threads.
+    A Linux eventfd is used if available, otherwise a pipe (Unix only).
+
+    As with threading.Event, waiting threads wake up on set() even if clear()
+    is called right after; the file descriptor is then only drained when the
+    last of these threads has woken up (it can thus stay readable briefly
+    after clear()).
+    """
+
+    def __init__(self):
+        if hasattr(os, 'eventfd'):  # Linux, python 3.10+
+            fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self._rfd = self._wfd = fd
+        else:
+            self._rfd, self._wfd = os.pipe()
+            os.set_blocking(self._rfd, False)
+            os.set_blocking(self._wfd, False)
+        self._flag = False
+        self._readable = False   # whether fd has been written and not drained
+        self._generation = 0     # incremented at each set()
+        self._waiting = 0        # number of threads/coroutines in wait()
+        self._lock = Lock()
+        self.is_closed = False
+
+    def __repr__(self):
+        """Str representation of FdEvent object"""
+        s = "{}, fd {}, set {}".format(self.__class__, self._rfd, self._flag)
+        return s
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def fileno(self):
+        """File descriptor, readable when the event is set."""
+        return self._rfd
+
+    def is_set(self):
+        return self._flag
+
+    def set(self):
+        with self._lock:
+            self._generation += 1
+            self._flag = True
+            if not self._readable:
+                self._readable = True
+                os.write(self._wfd, (1).to_bytes(8, 'little'))
+
+    def clear(self):
+        with self._lock:
+            self._flag = False
+            if not self._waiting:  # else, drained by the last waiter
+                self._drain()
+
+    def _drain(self):
+        """Make fd non-readable (call with lock acquired)."""
+        if not self._readable:
+            return
+        self._readable = False
+        try:
+            while os.read(self._rfd, 4096) and self._rfd != self._wfd:
+                pass   # drain pipe (eventfd is reset in one read)
+        except BlockingIOError:
+            pass
+
+    def _enter_wait(self):
+        """Register a waiter; return current generation, None if set."""
+        with self._lock:
+            if self._flag:
+                return None
+            self._waiting += 1
+            return self._generation
+
+    def _exit_wait(self, generation):
+        """Unregister a waiter; return True if set() was called meanwhile."""
+        with self._lock:
+            self._waiting -= 1
+            if not self._waiting and not self._flag:
+                self._drain()   # deferred by clear()
+            return self._flag or self._generation != generation
+
+    def wait(self, timeout=None, start=None):
+        """Block until the event is set or timeout (s) has passed.
+
+        As in oclock.Event, start (time.perf_counter() value) from which
+        timeout is counted can be passed by callers who already read the clock.
+        Returns True if the event has been set, False otherwise.
+        """
+        if self._flag:
+            return True
+        generation = self._enter_wait()
+        if generation is None:
+            return True
+        if timeout is None:
+            deadline = None
+        else:
+            deadline = (time.perf_counter() if start is None else start) + timeout
+        if hasattr(select, 'poll'):  # no limit on fd values, unlike select
+            poller = select.poll()
+            poller.register(self._rfd, select.POLLIN)
+        else:
+            poller = None
+        try:
+            while self._generation == generation:
+                if deadline is None:
+                    remaining = None
+                else:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                if poller is None:
+                    select.select([self._rfd], [], [], remaining)
+                else:
+                    # poll() timeout is in ms
+                    poller.poll(None if remaining is None
+                                else math.ceil(remaining * 1000))
+        finally:
+            was_set = self._exit_wait(generation)
+        return was_set
+
+    async def wait_async(self):
+        """Coroutine waiting for the event to be set (asyncio)."""
+        import asyncio   # only needed for asynchronous waits
+
+        if self._flag:
+            return True
+        generation = self._enter_wait()
+        if generation is None:
+            return True
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def on_readable():
+            if self._generation != generation and not future.done():
+                future.set_result(True)
+
+        loop.add_reader(self._rfd, on_readable)
+        try:
+            on_readable()  # in case set() was called in the meantime
+            await future
+        finally:
+            loop.remove_reader(self._rfd)
+            self._exit_wait(generation)
+        return True
+
+    def close(self):
+        """Close file descriptor(s)."""
+        if self.is_closed:
+            return
+        self.is_closed = True
+        os.close(self._rfd)
+        if self._wfd != self._rfd:
+            os.close(self._wfd)
+
+    def __del__(self):
+        if getattr(self, 'is_closed', True) is False:
+            self.close()
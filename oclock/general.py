@@ -21,7 +21,7 @@
 
 
 import time
-from datetime import timedelta
+from datetime import datetime, timedelta
 from contextlib import contextmanager
 from threading import Thread
 
@@ -99,9 +99,15 @@ def parse_time(time_str):
 
 
 @contextmanager
-def measure_time():
+def measure_time(recorder=None):
     """Measure mean unix time (s) and time uncertainty (s) of encapsulated commands.
 
+    Parameters
+    ----------
+    recorder : oclock.TickRecorder object (optional)
+        if provided, the timing of the measurement is also appended to the
+        recorder's file (mean time and total duration, in ns)
+
     Returns
     -------
     dict
@@ -139,16 +145,28 @@ def measure_time():
         t = (t1 + t2) / 2
         timing['time (unix)'] = t
         timing['dt (s)'] = dt
+        if recorder is not None:
+            recorder.record(int(t * 1e9), 0, int(2 * dt * 1e9),
+                            recorder.MEASUREMENT)
 
 
 @contextmanager
-def measure_duration():
+def measure_duration(cpu=False):
     """Measure duration (s) of encapsulated commands.
 
+    Parameters
+    ----------
+    cpu : bool
+        if True, also measure CPU time of the calling thread and of the
+        process, and context switches of the calling thread (Linux only),
+        to tell computing from waiting (I/O, locks) or preemption.
+
     Returns
     -------
     dict
-        Dictionary with total duration in seconds (key 'duration (s)')
+        Dictionary with total duration in seconds (key 'duration (s)'),
+        and if cpu is True, 'thread cpu (s)', 'process cpu (s)', and
+        (Linux) 'voluntary switches' and 'involuntary switches'
 
     Examples
     --------
@@ -156,24 +174,62 @@ def measure_duration():
     >>>     my_function()
     >>> print(duration)
     {'duration (s)': 0.9871297000004233}
+
+    >>> with measure_duration(cpu=True) as duration:
+    >>>     time.sleep(1)
+    >>> print(duration)
+    {'duration (s)': 1.0001, 'thread cpu (s)': 3.1e-05, 'process cpu (s)':
+     3.4e-05, 'voluntary switches': 1, 'involuntary switches': 0}
     """
     duration = {}
+    if cpu:
+        from .cputime import context_switches  # only needed for cpu breakdown
+        switches = context_switches()
+        c1 = time.thread_time_ns()
+        p1 = time.process_time_ns()
     t1 = time.perf_counter()
     try:
         yield duration
     finally:
         t2 = time.perf_counter()
         duration['duration (s)'] = t2 - t1
+        if cpu:
+            duration['thread cpu (s)'] = (time.thread_time_ns() - c1) * 1e-9
+            duration['process cpu (s)'] = (time.process_time_ns() - p1) * 1e-9
+            if switches is not None:
+                voluntary, involuntary = context_switches()
+                duration['voluntary switches'] = voluntary - switches[0]
+                duration['involuntary switches'] = involuntary - switches[1]
+
 
+def _wait_until(unix_time, check_interval=1):
+    """Sleep until given unix (wall-clock) time.
+
+    Sleeping is done with the monotonic clock, in chunks of at most
+    check_interval (s), re-evaluating the remaining time from the wall clock
+    between chunks, so that steps of the system clock (e.g. NTP) are followed.
+    """
+    while True:
+        remaining = unix_time - time.time()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, check_interval))
 
-def after(duration=':::', function=None, args=None, kwargs=None, blocking=True):
-    """Execute function after given waiting time
+
+def after(duration=':::', function=None, args=None, kwargs=None, blocking=True,
+          at=None):
+    """Execute function after given waiting time, or at given wall-clock time
 
     Parameters
     ----------
     duration : str
         time to wait in a format h:m:s (see oclock.parse_time())
 
+    at : datetime.datetime or float (optional)
+        if provided, absolute wall-clock time (datetime, or unix time in s) at
+        which the function is executed, instead of waiting duration; system
+        clock steps during the wait are taken into account.
+
     function : callable
         function or method to execute (e.g. device.on)
         NOTE: do not include parentheses or the function will be executed
@@ -194,12 +250,18 @@ def after(duration=':::', function=None, args=None, kwargs=None, blocking=True):
         - if blocking: returns result of function
         - if non-blocking: returns None
     """
-    wait_time = parse_time(duration).total_seconds()
+    if at is None:
+        wait_time = parse_time(duration).total_seconds()
+    else:
+        unix_time = at.timestamp() if isinstance(at, datetime) else at
     args = () if args is None else args
     kwargs = {} if kwargs is None else kwargs
 
     def exec_func():
-        time.sleep(wait_time)
+        if at is None:
+            time.sleep(wait_time)
+        else:
+            _wait_until(unix_time)
         return function(*args, **kwargs)
 
     if blocking:
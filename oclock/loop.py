@@ -20,6 +20,9 @@
 # If not, see <https://www.gnu.org/licenses/>
 
 
+import copy
+import time
+import traceback
 from threading import Thread
 from functools import wraps
 
@@ -29,6 +32,60 @@ from . import Timer
 # ============== Command Line Interface to interact with Timer ===============
 
 
+def command(timer, a):
+    """Apply text command to a timer object and return answer (str or None).
+
+    Commands are the same as in cli() (see below), i.e.
+    - any number (int/float): change timer interval to that new value
+    - 'p' or 'pause': pause timer
+    - 'r' or 'resume': resume timer
+    - 'R' or 'reset': reset timer
+    - 't' or 'time': print timing (interval, elapsed time, etc.) info
+    - 's' or 'status': same as 't', with name and state of the timer
+    - 'q', 'Q', 'quit' or 'stop': stop timer and exit
+    """
+    a = a.strip()
+    try:
+        dt = float(a)
+    except ValueError:
+        if a in ('p', 'pause'):
+            timer.pause()
+            return '--- Timer Paused'
+        elif a in ('r', 'resume'):
+            timer.resume()
+            return '--- Timer Resumed'
+        elif a in ('R', 'reset'):
+            timer.reset()
+            return '--- Timer Restarted'
+        elif a in ('t', 'time'):
+            elapsed = timer.elapsed_time
+            paused = timer.pause_time
+            dt = timer.interval
+            tnext = timer.next_checkpt_release - timer.now()
+            return ("[Interval {:.3f}] [Elapsed: {:.3f}] [Paused {:.3f}] "
+                    "[Next {:.3f}]".format(dt, elapsed, paused, tnext))
+        elif a in ('s', 'status'):
+            if timer.is_stopped:
+                state = 'stopped'
+            elif timer.is_paused:
+                state = 'paused'
+            else:
+                state = 'running'
+            return '[{}] [{}] '.format(timer.name, state) + command(timer, 't')
+        elif a in ('q', 'Q', 'quit', 'stop'):
+            timer.stop()
+            return '--- Timer Stopped'
+        else:
+            return None
+    else:
+        try:
+            timer.interval = dt
+        except ValueError:
+            return '--- Invalid Interval'
+        else:
+            return '--- Interval (s) changed to {}'.format(dt)
+
+
 def cli(timer):
     """Command line input to interact with a timer object.
 
@@ -54,37 +111,9 @@ def cli(timer):
 
     while not timer.is_stopped:
         a = input()
-        try:
-            dt = float(a)
-        except ValueError:
-            if a in ('p', 'pause'):
-                print('--- Timer Paused')
-                timer.pause()
-            elif a in ('r', 'resume'):
-                print('--- Timer Resumed')
-                timer.resume()
-            elif a in ('R', 'reset'):
-                print('--- Timer Restarted')
-                timer.reset()
-            elif a in ('t', 'time'):
-                elapsed = timer.elapsed_time
-                paused = timer.pause_time
-                dt = timer.interval
-                tnext = timer.next_checkpt_release - timer.now()
-                print("[Interval {:.3f}] [Elapsed: {:.3f}] [Paused {:.3f}] "
-                      "[Next {:.3f}]".format(dt, elapsed, paused, tnext))
-            elif a in ('q', 'Q', 'quit', 'stop'):
-                print('--- Timer Stopped')
-                timer.stop()
-            else:
-                pass
-        else:
-            try:
-                timer.interval = dt
-            except ValueError:
-                print('--- Invalid Interval')
-            else:
-                print('--- Interval (s) changed to {}'.format(dt))
+        answer = command(timer, a)
+        if answer:
+            print(answer)
 
     print('--- Loop Exited')
 
@@ -92,38 +121,296 @@ def cli(timer):
 # ========== Decorators to repeat function periodically using Timer ==========
 
 
-def loop(timer):
+def loop(timer, block=None):
     """Decorator to start a timed loop repeating a function periodically.
 
     Parameters
     ----------
     timer : oclock.Timer object
+
+    block : int (optional)
+        if provided, the loop wakes up only once per block of ticks (see
+        Timer.checkpt_block()), and the function is called as
+        function(timestamps, release, *args, **kwargs), with timestamps
+        a numpy array (reused at each block) of the block scheduled tick times
+        and release the actual release time.
     """
     def decorator(function):
         @wraps(function)
         def wrapper(*args, **kwargs):
-            while not timer.is_stopped:
-                timer.checkpt()
-                function(*args, **kwargs)
+            if block is None:
+                while not timer.is_stopped:
+                    timer.checkpt()
+                    function(*args, **kwargs)
+            else:
+                import numpy as np   # only needed for batched ticks
+                out = np.empty(block)
+                while not timer.is_stopped:
+                    timestamps, release = timer.checkpt_block(block, out=out)
+                    function(timestamps, release, *args, **kwargs)
         return wrapper
     return decorator
 
 
-def interactiveloop(**timer_kwargs):
+def interactiveloop(server=None, **timer_kwargs):
     """Decorator to start an interactive CLI for timed execution of a function
 
     Parameters
     ----------
-    any argument or keyword-argument taken by oclock.Timer(), e.g. 'interval'
+    server : oclock.ControlServer object (optional)
+        if provided, the timer is registered in the server (under the timer
+        name) instead of starting a command line thread reading stdin;
+        timers of different loops must then have different names.
+
+    any other argument or keyword-argument taken by oclock.Timer(),
+    e.g. 'interval'
     """
     def decorator(function):
         @wraps(function)
         def wrapper(*args, **kwargs):
             timer = Timer(**timer_kwargs)
-            Thread(target=cli, args=(timer,)).start()
+            if server is None:
+                Thread(target=cli, args=(timer,)).start()
+            else:
+                server.register(timer)
             timer.reset()  # removes any delay introduced by thread starting
-            while not timer.is_stopped:
-                function(*args, **kwargs)
-                timer.checkpt()
+            try:
+                while not timer.is_stopped:
+                    function(*args, **kwargs)
+                    timer.checkpt()
+            finally:
+                if server is not None:
+                    server.unregister(timer.name, timer)
+        return wrapper
+    return decorator
+
+
+# ================ Timed loops with time budget per iteration ================
+
+
+class Budget:
+    """Time budget of the current iteration of a budgetloop.
+
+    The deadline of each iteration is the release time of the next checkpt
+    (minus margin), in the reference of Timer.now(); the loop body can call
+    remaining() cooperatively, e.g. to stop an iterative computation in time.
+    """
+
+    def __init__(self, margin=0):
+        """Init Budget object.
+
+        Parameters
+        ----------
+        margin : float
+            time (s) reserved before the next checkpt release, i.e. the
+            deadline is next_checkpt_release - margin
+        """
+        self.margin = margin
+        self.deadline = float('inf')
+
+        # counters
+        self.iterations = 0   # number of iterations started
+        self.violations = 0   # iterations not finished before deadline
+        self.abandoned = 0    # iterations abandoned/terminated (hard mode)
+        self.skipped = 0      # iterations skipped, abandoned one still running
+
+    def __repr__(self):
+        """Str representation of Budget object"""
+        s = "{}, margin {}s, {} violations in {} iterations" \
+            .format(self.__class__, self.margin, self.violations,
+                    self.iterations)
+        return s
+
+    def remaining(self, now=time.perf_counter):
+        """Time (s) remaining before the deadline (negative if exceeded)."""
+        return self.deadline - now()
+
+    @property
+    def expired(self):
+        return time.perf_counter() > self.deadline
+
+    def stats(self):
+        return {'iterations': self.iterations, 'violations': self.violations,
+                'abandoned': self.abandoned, 'skipped': self.skipped}
+
+
+def _resolve_function(module, qualname):
+    """Find function decorated with budgetloop by name (in worker process)."""
+    import inspect
+    import importlib
+    obj = importlib.import_module(module)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name)
+    # with decorator syntax, the name refers to the wrapper of budgetloop
+    function = inspect.unwrap(obj, stop=lambda f: not isinstance(
+        getattr(f, 'budget', None), Budget))
+    return _FunctionReference(function)
+
+
+class _FunctionReference:
+    """Function sent to the worker process, pickled by module and name.
+
+    Pickle cannot send a function decorated with @budgetloop to a spawned
+    process, because its module-level name refers to the wrapper, not to the
+    function itself; the function is thus found again by name in the worker
+    (with the fork start method, no pickling happens and any function works).
+    """
+
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        self.function = function
+
+    def __reduce__(self):
+        function = self.function
+        return _resolve_function, (function.__module__, function.__qualname__)
+
+
+def _process_worker(reference, connection):
+    """Run in a persistent process: execute iterations sent by budgetloop."""
+    function = reference.function
+    connection.send(None)   # ready
+    for budget, args, kwargs in iter(connection.recv, None):
+        try:
+            function(budget, *args, **kwargs)
+        except Exception:
+            traceback.print_exc()
+        connection.send(None)   # iteration done
+
+
+class _WorkerProcess:
+    """Persistent process executing budgetloop iterations (hard='process').
+
+    The process is started once and reused for all iterations, so that
+    process startup (milliseconds with fork, much more with spawn) is not
+    paid at each iteration; it is restarted only after being terminated.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self._process = None
+        self._connection = None
+        self.start()
+
+    def start(self):
+        """Start process and wait until it is ready."""
+        import multiprocessing   # only needed for hard='process'
+        self._connection, child = multiprocessing.Pipe()
+        reference = _FunctionReference(self.function)
+        self._process = multiprocessing.Process(target=_process_worker,
+                                                args=(reference, child),
+                                                daemon=True)
+        self._process.start()
+        child.close()
+        self._connection.recv()
+
+    def run(self, budget, args, kwargs, timeout):
+        """Execute an iteration; return False if not done within timeout."""
+        self._connection.send((budget, args, kwargs))
+        if self._connection.poll(timeout):
+            self._connection.recv()
+            return True
+        return False
+
+    def restart(self):
+        """Terminate process (e.g. iteration past deadline) and start anew."""
+        self._process.terminate()
+        self._process.join()
+        self._connection.close()
+        self.start()
+
+    def close(self):
+        self._connection.send(None)
+        self._process.join()
+        self._connection.close()
+
+
+def _run_hard(function, args, kwargs, budget, hard, worker):
+    """Run function in a worker until deadline; return (worker, violated).
+
+    The body receives a copy of budget, so that its deadline is not moved by
+    the next iterations (e.g. for abandoned threads).
+    """
+    if hard == 'process':
+        if worker.run(copy.copy(budget), args, kwargs, max(budget.remaining(), 0)):
+            return worker, False
+        budget.abandoned += 1
+        worker.restart()
+        return worker, True
+    if worker is not None and worker.is_alive():  # abandoned thread
+        budget.skipped += 1
+        return worker, False
+    worker = Thread(target=function, args=(copy.copy(budget),) + args,
+                    kwargs=kwargs, daemon=True)
+    worker.start()
+    worker.join(max(budget.remaining(), 0))
+    if not worker.is_alive():
+        return None, False
+    budget.abandoned += 1
+    return worker, True
+
+
+def budgetloop(timer, budget=None, hard=None, on_violation=None):
+    """Decorator to start a timed loop where each iteration has a deadline.
+
+    The decorated function is called as function(budget, *args, **kwargs),
+    with budget an oclock.loop.Budget object (see Budget.remaining()); the
+    deadline of an iteration is the release time of the next checkpt.
+
+    Parameters
+    ----------
+    timer : oclock.Timer object
+
+    budget : oclock.loop.Budget object
+        (optional) to define a margin, default Budget(); counters of
+        violations are available in wrapper.budget
+
+    hard : None, 'thread' or 'process'
+        - None (default): cooperative budget, violations are only reported
+        - 'thread': the body runs in a thread which is abandoned (i.e. left
+          running in the background) at the deadline; iterations are then
+          skipped until it finishes
+        - 'process': the body runs in a persistent worker process, which
+          is terminated at the deadline and restarted (with the spawn start
+          method, the function must be defined at module level, and
+          arguments must be picklable; uses the fact that perf_counter is
+          system-wide on most platforms); the worker is started before the
+          first iteration.
+        In both hard modes, the tick grid of the timer is kept intact, and
+        the body receives a copy of the budget with the deadline of its own
+        iteration.
+
+    on_violation : callable
+        called as on_violation(budget) when an iteration exceeds its deadline
+    """
+    if hard not in (None, 'thread', 'process'):
+        raise ValueError("hard must be None, 'thread' or 'process'")
+    budget = Budget() if budget is None else budget
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            worker = None
+            if hard == 'process':
+                worker = _WorkerProcess(function)   # ready before 1st iteration
+            try:
+                while not timer.is_stopped:
+                    timer.checkpt()
+                    budget.deadline = timer.next_checkpt_release - budget.margin
+                    budget.iterations += 1
+                    if hard is None:
+                        function(budget, *args, **kwargs)
+                        violated = budget.expired
+                    else:
+                        worker, violated = _run_hard(function, args, kwargs,
+                                                     budget, hard, worker)
+                    if violated:
+                        budget.violations += 1
+                        if on_violation is not None:
+                            on_violation(budget)
+            finally:
+                if hard == 'process':
+                    worker.close()
+        wrapper.budget = budget
         return wrapper
     return decorator
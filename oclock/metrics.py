@@ -0,0 +1,295 @@
+"""Export health metrics of timed loops in Prometheus text format."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import os
+from bisect import bisect_left
+from threading import Thread, Lock
+
+from .timer import Timer
+from .cputime import CpuBreakdown, causes
+
+
+# Default upper bounds (s) of the lateness histogram buckets
+default_buckets = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1)
+
+content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ========================= Per-timer statistics hook ========================
+
+
+class TimerStats:
+    """Tick statistics of a timer, updated by the timer at each checkpt.
+
+    Instances are used as timer hooks (see Timer.add_hook()); the update only
+    consists in a few integer/float operations without any lock, and readers
+    (e.g. scrapers) only take copies of the counters.
+    """
+
+    __slots__ = ('buckets', 'ticks', 'overruns', 'lateness_sum', 'counts')
+
+    def __init__(self, buckets=default_buckets):
+        """Init TimerStats object.
+
+        Parameters
+        ----------
+        buckets : iterable of float
+            upper bounds (s) of the lateness histogram buckets
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.ticks = 0
+        self.overruns = 0
+        self.lateness_sum = 0.
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+
+    def __call__(self, timer, entry, scheduled, release):
+        """Update statistics (called by the timer after each checkpt)."""
+        lateness = release - scheduled
+        self.ticks += 1
+        if entry >= scheduled:
+            self.overruns += 1
+        self.lateness_sum += lateness
+        self.counts[bisect_left(self.buckets, lateness)] += 1
+
+
+# ============================== Exporter class ==============================
+
+
+def _escape(value):
+    """Escape label value according to the Prometheus text format."""
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class MetricsExporter:
+    """Collect timer metrics and serve them in Prometheus text format."""
+
+    def __init__(self, prefix='oclock_timer', buckets=default_buckets,
+                 cpu=False):
+        """Init MetricsExporter object.
+
+        Parameters
+        ----------
+        prefix : str
+            prefix of all metric names
+
+        buckets : iterable of float
+            upper bounds (s) of the lateness histogram buckets
+
+        cpu : bool
+            if True, also export wall and CPU time of loop bodies, and
+            overruns per cause (see oclock.cputime.CpuBreakdown)
+        """
+        self.prefix = prefix
+        self.buckets = buckets
+        self.cpu = cpu
+        self.timers = {}  # name: (timer, stats)
+        self.breakdowns = {}  # name: CpuBreakdown, if cpu is True
+        self._lock = Lock()
+        self._server = None
+        self._textfile_timer = None
+
+    def __repr__(self):
+        """Str representation of MetricsExporter object"""
+        s = "{}, prefix '{}', timers {}" \
+            .format(self.__class__, self.prefix, list(self.timers))
+        return s
+
+    def register(self, timer, name=None):
+        """Start collecting metrics of timer, under name (or timer.name)."""
+        name = timer.name if name is None else name
+        stats = TimerStats(self.buckets)
+        with self._lock:
+            if name in self.timers:
+                raise ValueError('Timer name already registered: {}'.format(name))
+            self.timers[name] = timer, stats
+            if self.cpu:
+                self.breakdowns[name] = breakdown = CpuBreakdown()
+        timer.add_hook(stats)
+        if self.cpu:
+            timer.add_hook(breakdown)
+        return stats
+
+    def unregister(self, name):
+        """Stop collecting metrics of timer of given name."""
+        with self._lock:
+            timer, stats = self.timers.pop(name)
+            breakdown = self.breakdowns.pop(name, None)
+        timer.remove_hook(stats)
+        if breakdown is not None:
+            timer.remove_hook(breakdown)
+
+    def render(self):
+        """Return all metrics as a str in Prometheus text format."""
+        with self._lock:
+            timers = list(self.timers.items())
+            breakdowns = list(self.breakdowns.items())
+
+        p = self.prefix
+        gauges = (
+            ('interval_seconds', 'Timer interval.', lambda t: t.interval),
+            ('elapsed_seconds', 'Elapsed time since start or reset.',
+             lambda t: t.elapsed_time),
+            ('pause_seconds', 'Total duration of pauses.',
+             lambda t: t.pause_time),
+            ('paused', 'Whether the timer is paused.',
+             lambda t: int(t.is_paused)),
+            ('stopped', 'Whether the timer is stopped.',
+             lambda t: int(t.is_stopped)),
+        )
+
+        lines = []
+
+        for metric, description, getter in gauges:
+            lines.append('# HELP {}_{} {}'.format(p, metric, description))
+            lines.append('# TYPE {}_{} gauge'.format(p, metric))
+            for name, (timer, stats) in timers:
+                lines.append('{}_{}{{timer="{}"}} {}'
+                             .format(p, metric, _escape(name), getter(timer)))
+
+        # Copies of counters are taken first so that the exposed values
+        # are consistent with each other within a timer.
+        snapshots = [(name, stats.ticks, stats.overruns,
+                      stats.lateness_sum, list(stats.counts), stats.buckets)
+                     for name, (timer, stats) in timers]
+
+        for metric, description, index in (
+                ('ticks_total', 'Number of checkpts.', 1),
+                ('overruns_total', 'Number of checkpts called too late.', 2)):
+            lines.append('# HELP {}_{} {}'.format(p, metric, description))
+            lines.append('# TYPE {}_{} counter'.format(p, metric))
+            for snapshot in snapshots:
+                lines.append('{}_{}{{timer="{}"}} {}'
+                             .format(p, metric, _escape(snapshot[0]),
+                                     snapshot[index]))
+
+        metric = p + '_lateness_seconds'
+        lines.append('# HELP {} Delay between scheduled and actual checkpt '
+                     'release.'.format(metric))
+        lines.append('# TYPE {} histogram'.format(metric))
+        for name, ticks, _, lateness_sum, counts, buckets in snapshots:
+            label = _escape(name)
+            cumulated = 0
+            for bound, count in zip(buckets + ('+Inf',), counts):
+                cumulated += count
+                lines.append('{}_bucket{{timer="{}",le="{}"}} {}'
+                             .format(metric, label, bound, cumulated))
+            lines.append('{}_sum{{timer="{}"}} {}'
+                         .format(metric, label, lateness_sum))
+            lines.append('{}_count{{timer="{}"}} {}'
+                         .format(metric, label, cumulated))
+
+        if breakdowns:
+            lines.extend(self._render_breakdowns(breakdowns))
+
+        return '\n'.join(lines) + '\n'
+
+    def _render_breakdowns(self, breakdowns):
+        """Lines of CPU breakdown metrics (Prometheus text format)."""
+        p = self.prefix
+        snapshots = [(_escape(name), b.wall_ns, b.cpu_ns, dict(b.causes))
+                     for name, b in breakdowns]
+        lines = []
+
+        for metric, description, index in (
+                ('body_seconds_total', 'Wall time of loop bodies.', 1),
+                ('body_cpu_seconds_total', 'Thread CPU time of loop bodies.', 2)):
+            lines.append('# HELP {}_{} {}'.format(p, metric, description))
+            lines.append('# TYPE {}_{} counter'.format(p, metric))
+            for snapshot in snapshots:
+                lines.append('{}_{}{{timer="{}"}} {}'
+                             .format(p, metric, snapshot[0],
+                                     snapshot[index] * 1e-9))
+
+        metric = p + '_overruns_by_cause_total'
+        lines.append('# HELP {} Overruns attributed to cpu, waiting or '
+                     'scheduling.'.format(metric))
+        lines.append('# TYPE {} counter'.format(metric))
+        for label, _, _, counts in snapshots:
+            for cause in causes:
+                lines.append('{}{{timer="{}",cause="{}"}} {}'
+                             .format(metric, label, cause, counts[cause]))
+
+        return lines
+
+    # ---------------------------- HTTP endpoint -----------------------------
+
+    def serve(self, port=9123, address='127.0.0.1'):
+        """Serve metrics on http://address:port/metrics (separate thread).
+
+        Returns the actual (address, port), useful if port=0 (chosen by OS).
+        """
+        # only needed for the HTTP endpoint
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((address, port), Handler)
+        self._server.daemon_threads = True
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address
+
+    def shutdown(self):
+        """Stop HTTP server and/or periodic textfile writing."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._textfile_timer is not None:
+            self._textfile_timer.stop()
+            self._textfile_timer = None
+
+    # --------------------------- Textfile collector -------------------------
+
+    def write_textfile(self, path):
+        """Write metrics atomically to path (e.g. for node_exporter *.prom)."""
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(self.render())
+        os.replace(tmp_path, path)
+
+    def start_textfile(self, path, interval=15):
+        """Write metrics to path every interval (s), in a separate thread."""
+        timer = Timer(interval=interval, name='MetricsExporter textfile')
+        self._textfile_timer = timer
+
+        def write_periodically():
+            while not timer.is_stopped:
+                self.write_textfile(path)
+                timer.checkpt()
+
+        Thread(target=write_periodically, daemon=True).start()
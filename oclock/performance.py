@@ -20,13 +20,29 @@
 # If not, see <https://www.gnu.org/licenses/>
 
 
+import sys
 import time
+import timeit
 from random import random
 from queue import Queue
+from threading import Thread
 
 import numpy as np
 
-from . import Timer, measure_duration
+from . import Timer, Event, PreciseBarrier, measure_duration
+from .cputime import CpuBreakdown
+
+
+# Maximum per-call overheads (s) accepted for hot-path operations (see
+# overhead_test()); the corresponding (opt-in) test fails if one is exceeded.
+overhead_budget = {
+    'Timer.checkpt': 2e-6,
+    'Timer.checkpt (wait)': 8e-6,   # includes Event.set() and clear()
+    'Timer.elapsed_time': 1.5e-6,
+    'Timer.pause/resume': 10e-6,
+    'Event.set': 2e-6,
+    'Event.wait': 2e-6,
+}
 
 
 def constant_duration_loop(timer, q, fracmax=0.5, n=10):
@@ -74,8 +90,13 @@ def performance_test(dt, nloops, fmax, plot=False, warnings=False, precise=False
     - plot: if True, show plot (matplotlib) of timing of all loops
     - warnings: if True, prints a warning when time interval too short
     - precise: if True, increase time precision (useful for Windows)
+
+    Returns mean and standard deviation of loop durations, and mean thread
+    CPU time of loop bodies (see oclock.cputime.CpuBreakdown).
     """
     timer = Timer(interval=dt, warnings=warnings, precise=precise)
+    breakdown = CpuBreakdown()
+    timer.add_hook(breakdown)
     q = Queue()
 
     print('Test Started')
@@ -90,6 +111,11 @@ def performance_test(dt, nloops, fmax, plot=False, warnings=False, precise=False
     print("Mean dt - Requested dt (ms): {}".format((avg - dt) * 1000))
     print("Std dev (ms): {}".format(dev * 1000))
 
+    cpu = breakdown.stats()
+    mean_cpu = cpu['cpu (s)'] / cpu['ticks'] if cpu['ticks'] else 0.
+    print("Loop body CPU fraction: {}, overrun causes: {}"
+          .format(cpu['cpu fraction'], cpu['overrun causes']))
+
     if plot:
 
         import matplotlib.pyplot as plt
@@ -119,4 +145,154 @@ def performance_test(dt, nloops, fmax, plot=False, warnings=False, precise=False
         ax.legend()
         plt.show()
 
-    return {'mean dt (s)': avg, 'std dev (s)': dev}
+    return {'mean dt (s)': avg, 'std dev (s)': dev,
+            'mean body cpu (s)': mean_cpu, 'body cpu fraction': cpu['cpu fraction']}
+
+
+def scaling_test(nthreads=(1, 2, 4, 8), ntimers=10, duration=1):
+    """Test how checkpt() throughput scales with the number of threads.
+
+    - nthreads: iterable of numbers of threads to test
+    - ntimers: number of timers driven by each thread
+    - duration: duration (s) of the test for each number of threads
+
+    Timers have a zero interval so that only the overhead of checkpt() is
+    measured. On free-threaded (no-GIL) Python builds, the total throughput is
+    expected to increase with the number of threads (up to the number of
+    cores); with the GIL, it stays roughly constant.
+
+    Returns a dict {number of threads: total number of checkpts per second}.
+    """
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('GIL enabled: {}'.format(gil))
+
+    def drive(timers, counts, i):
+        n = 0
+        t_end = time.perf_counter() + duration
+        while time.perf_counter() < t_end:
+            for timer in timers:
+                timer.checkpt()
+            n += len(timers)
+        counts[i] = n
+
+    results = {}
+
+    for n in nthreads:
+        counts = [0] * n
+        threads = [Thread(target=drive,
+                          args=([Timer(interval=0) for _ in range(ntimers)],
+                                counts, i))
+                   for i in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results[n] = sum(counts) / duration
+        print("{} threads: {:.0f} checkpts/s".format(n, results[n]))
+
+    return results
+
+
+def barrier_skew_test(nthreads=(1, 2, 4, 8, 16), repeat=20, delay=0.01,
+                      spin=0.002):
+    """Release skew of threads waiting for the same deadline.
+
+    - nthreads: iterable of numbers of threads to test
+    - repeat: number of releases for each number of threads
+    - delay: time (s) between the start of the threads and the deadline
+    - spin: see PreciseBarrier
+
+    Compares PreciseBarrier with independent waits (each thread waiting
+    for the deadline with its own oclock.Event). The skew of a release is the
+    time between the first and the last thread released.
+
+    Returns a dict {number of threads: {'barrier': skews, 'independent':
+    skews}} with skews numpy arrays (s) of length repeat.
+    """
+    pc = time.perf_counter
+
+    def wait_independent(deadline, releases, i):
+        Event().wait(deadline - pc())
+        releases[i] = pc()
+
+    def wait_barrier(barrier, deadline, releases, i):
+        releases[i] = barrier.wait(deadline)
+
+    results = {}
+
+    for n in nthreads:
+        skews = {'barrier': [], 'independent': []}
+        barrier = PreciseBarrier(n, spin=spin)
+        for _ in range(repeat):
+            for kind in skews:
+                releases = [0.] * n
+                deadline = pc() + delay
+                if kind == 'barrier':
+                    threads = [Thread(target=wait_barrier,
+                                      args=(barrier, deadline, releases, i))
+                               for i in range(n)]
+                else:
+                    threads = [Thread(target=wait_independent,
+                                      args=(deadline, releases, i))
+                               for i in range(n)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                skews[kind].append(max(releases) - min(releases))
+        results[n] = {kind: np.array(values) for kind, values in skews.items()}
+        print("{} threads: release skew (us), median/max: barrier {:.0f}/{:.0f}, "
+              "independent {:.0f}/{:.0f}"
+              .format(n, *(f(results[n][kind]) * 1e6 for kind in skews
+                           for f in (np.median, np.max))))
+
+    return results
+
+
+def overhead_test(number=20000, repeat=5, budget=None):
+    """Measure per-call overhead (s) of hot-path Timer and Event operations.
+
+    - number: number of calls per measurement
+    - repeat: number of measurements (the best one is kept)
+    - budget: dict of maximum overheads (s), e.g. oclock.performance.overhead_budget
+
+    Timer.checkpt is measured with a zero interval, i.e. on the branch where
+    the interval is exceeded and the checkpt releases immediately, and
+    Timer.checkpt (wait) on the branch where the checkpt waits, with a long
+    interval and the bypass event set just before (as by reset(), so the
+    measure includes an Event.set); Event.wait is measured on an event that
+    is set.
+
+    Returns a dict {operation: overhead (s)}. If budget is provided, raises
+    a RuntimeError if any of the operations exceeds its budget.
+    """
+    timer = Timer(interval=0)
+    waiting_timer = Timer(interval=3600)
+    event = Event()
+    event.set()
+
+    statements = {
+        'Timer.checkpt': 'timer.checkpt()',
+        'Timer.checkpt (wait)': 'bypass.set(); waiting_timer.checkpt()',
+        'Timer.elapsed_time': 'timer.elapsed_time',
+        'Timer.pause/resume': 'timer.pause(); timer.resume()',
+        'Event.set': 'event.set()',
+        'Event.wait': 'event.wait()',
+    }
+    namespace = {'timer': timer, 'waiting_timer': waiting_timer,
+                 'bypass': waiting_timer._bypass_checkpt, 'event': event}
+
+    results = {}
+    for name, statement in statements.items():
+        t = min(timeit.repeat(statement, number=number, repeat=repeat,
+                              globals=namespace))
+        results[name] = t / number
+        print("{}: {:.3f} us".format(name, results[name] * 1e6))
+
+    if budget is not None:
+        exceeded = {name: value for name, value in results.items()
+                    if name in budget and value > budget[name]}
+        if exceeded:
+            raise RuntimeError('Overhead budget exceeded: {}'.format(exceeded))
+
+    return results
@@ -0,0 +1,374 @@
+"""Fixed-rate acquisition pipeline: timed producer and buffered consumers."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import time
+import traceback
+from collections import deque
+from threading import Thread, Condition, Lock
+
+
+policies = ('block', 'drop_oldest', 'drop_newest')
+
+
+# =========================== Bounded queue class ============================
+
+
+class BoundedQueue:
+    """Bounded FIFO queue with explicit policy when full.
+
+    Policies:
+    - 'block': put() waits until there is room in the queue
+    - 'drop_oldest': oldest item is discarded to make room for the new one
+    - 'drop_newest': new item is discarded
+    """
+
+    def __init__(self, maxsize=1000, policy='block'):
+        if policy not in policies:
+            raise ValueError('Policy must be in {}'.format(policies))
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.is_closed = False
+        self._items = deque()
+        self._condition = Condition()
+
+    def __repr__(self):
+        """Str representation of BoundedQueue object"""
+        s = "{}, {}/{} items, policy '{}', {} dropped" \
+            .format(self.__class__, len(self), self.maxsize, self.policy,
+                    self.dropped)
+        return s
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """Put item in queue; return False if an item had to be dropped."""
+        with self._condition:
+            items = self._items
+            kept = True
+            if len(items) >= self.maxsize:
+                if self.policy == 'block':
+                    while len(items) >= self.maxsize and not self.is_closed:
+                        self._condition.wait()
+                elif self.policy == 'drop_oldest':
+                    items.popleft()
+                    self.dropped += 1
+                    kept = False
+                else:
+                    self.dropped += 1
+                    return False
+            items.append(item)
+            self._condition.notify_all()
+            return kept
+
+    def get_batch(self, size=1, timeout=None):
+        """Get up to size items (list); wait until size items or timeout.
+
+        Returns as soon as size items are available, or when timeout (s) has
+        passed with at least one item available, or when the queue is closed
+        (returning an empty list when closed and empty).
+        """
+        with self._condition:
+            items = self._items
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while len(items) < size and not self.is_closed:
+                if deadline is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        self._condition.wait(remaining)
+                    elif items:
+                        break
+                    else:  # wait for at least one item
+                        self._condition.wait()
+            batch = [items.popleft() for _ in range(min(size, len(items)))]
+            self._condition.notify_all()
+            return batch
+
+    def close(self):
+        """Close queue: wake up all waiting threads (remaining items stay)."""
+        with self._condition:
+            self.is_closed = True
+            self._condition.notify_all()
+
+
+# ============================== Consumer stage ==============================
+
+
+def _process_worker(function, tasks, errors):
+    """Run in separate processes: call function on batches until None."""
+    for batch in iter(tasks.get, None):
+        try:
+            function(*batch)
+        except Exception:
+            with errors.get_lock():
+                errors.value += 1
+            traceback.print_exc()
+
+
+class Stage:
+    """Consumer stage of a Pipeline, with its own queue and workers."""
+
+    def __init__(self, function, name=None, workers=1, maxsize=1000,
+                 policy='drop_oldest', batch_size=1, batch_timeout=None,
+                 processes=False):
+        """Init Stage object.
+
+        Parameters
+        ----------
+        function : callable
+            called as function(times, samples), where times and samples are
+            numpy arrays of (at most batch_size) timestamps (unix time) and
+            samples produced by the pipeline source
+
+        name : str
+            name of the stage (default: name of function)
+
+        workers : int
+            number of threads (or processes) executing function in parallel
+
+        maxsize : int
+            maximum number of samples waiting in the stage queue
+
+        policy : str
+            'block', 'drop_oldest' or 'drop_newest', what to do when the
+            queue is full (see BoundedQueue); NOTE: 'block' also blocks the
+            producer, and thus perturbs the sampling clock.
+
+        batch_size : int
+            maximum number of samples passed at once to function
+
+        batch_timeout : float
+            maximum time (s) to wait for a full batch (default: wait forever,
+            except when the pipeline is stopped)
+
+        processes : bool
+            if True, function is executed in worker processes (function and
+            samples must then be picklable); samples are passed to processes
+            through a small buffer, and counters are then updated when batches
+            are handed over to the processes.
+
+        Exceptions raised by function are printed and counted (see stats()),
+        and the stage keeps consuming the next batches.
+        """
+        self.function = function
+        self.name = getattr(function, '__name__', 'stage') if name is None else name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.processes = processes
+        self.queue = BoundedQueue(maxsize=maxsize, policy=policy)
+
+        # counters
+        self.samples = 0         # number of samples processed
+        self.batches = 0         # number of batches processed
+        self.busy_time = 0.      # total time (s) spent in function
+        self.latency_sum = 0.    # sum of latencies (s) of samples
+        self.latency_max = 0.    # max latency (s) of samples
+        self._errors = 0         # batches whose processing raised an exception
+        self._process_errors = None  # shared counter, if processes
+
+        self._threads = []
+        self._processes = []
+        self._lock = Lock()  # protects counters, updated by several workers
+
+    def __repr__(self):
+        """Str representation of Stage object"""
+        s = "{}, name '{}', {} workers, batch size {}" \
+            .format(self.__class__, self.name, self.workers, self.batch_size)
+        return s
+
+    def _update(self, batch, start, end):
+        """Update counters after a batch has been processed."""
+        latencies = [start - t for t, _ in batch]
+        with self._lock:
+            self.samples += len(batch)
+            self.batches += 1
+            self.busy_time += end - start
+            self.latency_sum += sum(latencies)
+            self.latency_max = max(self.latency_max, max(latencies))
+
+    @property
+    def errors(self):
+        """Number of batches whose processing raised an exception."""
+        if self._process_errors is not None:
+            return self._errors + self._process_errors.value
+        return self._errors
+
+    def _arrays(self, batch):
+        import numpy as np   # only needed for pipelines
+        times = np.fromiter((t for t, _ in batch), dtype=float, count=len(batch))
+        samples = np.asarray([sample for _, sample in batch])
+        return times, samples
+
+    def _run_thread(self):
+        while True:
+            batch = self.queue.get_batch(self.batch_size, self.batch_timeout)
+            if not batch:
+                return
+            start = time.time()
+            try:
+                self.function(*self._arrays(batch))
+            except Exception:
+                with self._lock:
+                    self._errors += 1
+                traceback.print_exc()
+            self._update(batch, start, time.time())
+
+    def _feed_processes(self, tasks):
+        while True:
+            batch = self.queue.get_batch(self.batch_size, self.batch_timeout)
+            if not batch:
+                break
+            start = time.time()
+            tasks.put(self._arrays(batch))  # blocks if processes are too slow
+            self._update(batch, start, time.time())
+        for _ in self._processes:
+            tasks.put(None)
+
+    def start(self):
+        if self.processes:
+            import multiprocessing
+            tasks = multiprocessing.Queue(maxsize=2 * self.workers)
+            self._process_errors = errors = multiprocessing.Value('i', 0)
+            self._processes = [multiprocessing.Process(target=_process_worker,
+                                                       args=(self.function, tasks,
+                                                             errors))
+                               for _ in range(self.workers)]
+            self._threads = [Thread(target=self._feed_processes, args=(tasks,))]
+        else:
+            self._threads = [Thread(target=self._run_thread)
+                             for _ in range(self.workers)]
+        for worker in self._processes + self._threads:
+            worker.start()
+
+    def join(self):
+        for worker in self._threads + self._processes:
+            worker.join()
+
+    def stats(self, duration):
+        """Dict of counters, with throughput computed over duration (s)."""
+        return {
+            'samples': self.samples,
+            'batches': self.batches,
+            'errors': self.errors,
+            'dropped': self.queue.dropped,
+            'queued': len(self.queue),
+            'throughput (samples/s)': self.samples / duration if duration else 0,
+            'busy time (s)': self.busy_time,
+            'mean latency (s)': self.latency_sum / self.samples if self.samples else 0,
+            'max latency (s)': self.latency_max,
+        }
+
+
+# ============================== Pipeline class ==============================
+
+
+class Pipeline:
+    """Timed producer sampling a source, feeding several consumer stages."""
+
+    def __init__(self, timer, source, stages):
+        """Init Pipeline object (acquisition starts with start()).
+
+        Parameters
+        ----------
+        timer : oclock.Timer object
+            timer defining the sampling interval
+
+        source : callable
+            called without arguments at each tick of the timer; returns
+            a sample (e.g. a measurement from a device) which is passed to
+            all stages with its timestamp (unix time)
+
+        stages : iterable of oclock.pipeline.Stage objects
+        """
+        self.timer = timer
+        self.source = source
+        self.stages = list(stages)
+
+        # producer counters
+        self.samples = 0
+        self.missed = 0         # number of sampling ticks missed
+        self.source_time = 0.   # total time (s) spent in source
+        self._start_time = None
+        self._stop_time = None
+        self._thread = None
+
+    def __repr__(self):
+        """Str representation of Pipeline object"""
+        s = "{}, interval {}s, stages {}" \
+            .format(self.__class__, self.timer.interval,
+                    [stage.name for stage in self.stages])
+        return s
+
+    def _produce(self):
+        timer = self.timer
+        stages = self.stages
+        source = self.source
+        now = time.time
+        for tick in timer.ticks():
+            self.missed += tick.missed
+            t = now()
+            sample = source()
+            self.source_time += now() - t
+            item = (t, sample)
+            for stage in stages:
+                stage.queue.put(item)
+            self.samples += 1
+
+    def start(self):
+        """Start stages and producer thread."""
+        for stage in self.stages:
+            stage.start()
+        self._start_time = time.time()
+        self.timer.reset()
+        self._thread = Thread(target=self._produce)
+        self._thread.start()
+
+    def stop(self):
+        """Stop producer and timer, let stages finish processing queued data."""
+        self.timer.stop()
+        # closing queues first unblocks the producer if stuck in a put()
+        for stage in self.stages:
+            stage.queue.close()
+        self._thread.join()
+        self._stop_time = time.time()
+        for stage in self.stages:
+            stage.join()
+
+    def stats(self):
+        """Counters of producer ('source') and of each stage (by name)."""
+        end = time.time() if self._stop_time is None else self._stop_time
+        duration = end - self._start_time if self._start_time else 0
+        stats = {'source': {
+            'samples': self.samples,
+            'missed': self.missed,
+            'throughput (samples/s)': self.samples / duration if duration else 0,
+            'busy time (s)': self.source_time,
+        }}
+        for stage in self.stages:
+            stats[stage.name] = stage.stats(duration)
+        return stats
@@ -0,0 +1,261 @@
+"""Playback of arbitrary (e.g. recorded) schedules of trigger times."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import time
+import threading
+
+from .event import Event
+
+
+class Playback:
+    """Fire a callback at each time of a schedule (array or file of times)."""
+
+    def __init__(self, schedule, callback, speed=1, absolute=False,
+                 precise=False, dtype='float64', chunk_size=65536):
+        """Init Playback object (playback starts with run() or start()).
+
+        Parameters
+        ----------
+        schedule : array-like or str
+            trigger times in seconds; if str, path to a .npy file or to
+            a raw binary file of values of type dtype, which is memory-mapped
+            (entries are read by chunks and never loaded all at once).
+
+        callback : callable
+            function called as callback(index, t) at each trigger, with index
+            the position in the schedule and t the corresponding schedule value
+
+        speed : float
+            playback speed factor (e.g. 2 for twice as fast); relative mode only
+
+        absolute : bool
+            if False (default), times are relative to the start of playback,
+            i.e. t=0 fires immediately at start; if True, times are unix times
+            (e.g. recorded with oclock.measure_time() or time.time())
+
+        precise : bool
+            if True, use oclock.Event for waiting, for better time precision
+
+        dtype : str
+            type of values in raw binary files (ignored for other schedules)
+
+        chunk_size : int
+            number of schedule entries read at once
+        """
+        import numpy as np   # only needed for playback
+
+        if isinstance(schedule, str):
+            if schedule.endswith('.npy'):
+                schedule = np.load(schedule, mmap_mode='r')
+            else:
+                schedule = np.memmap(schedule, dtype=dtype, mode='r')
+
+        self._np = np
+        self.schedule = schedule
+        self.callback = callback
+        self.absolute = absolute
+        self.chunk_size = chunk_size
+
+        if absolute and speed != 1:
+            raise ValueError('Speed factor only possible for relative schedules')
+        if speed <= 0:
+            raise ValueError('Speed must be positive')
+        self._speed = speed
+
+        self._chunk = np.empty(0)
+        self._chunk_start = 0
+
+        self._lock = threading.Lock()
+        # used to interrupt waiting when pausing, seeking, stopping etc.
+        self._wake = Event() if precise else threading.Event()
+        # used to wait for playback reactivation when in a paused state
+        self._unpause_event = Event() if precise else threading.Event()
+        self._unpause_event.set()
+
+        self._index = 0
+        self._origin = None
+        self._pause_init_time = None
+        self.is_paused = False
+        self.is_stopped = False
+        self._thread = None
+
+    def __repr__(self):
+        """Str representation of Playback object"""
+        s = "{}, {} triggers, index {}, speed {}, absolute {}" \
+            .format(self.__class__, len(self), self._index, self._speed,
+                    self.absolute)
+        return s
+
+    def __len__(self):
+        return len(self.schedule)
+
+    @staticmethod
+    def now():
+        """Define what is considered as current time"""
+        return time.perf_counter()
+
+    # ========================== Schedule conversion =========================
+
+    def _value(self, i):
+        """Schedule value at index i, reading schedule by chunks."""
+        k = i - self._chunk_start
+        if not 0 <= k < len(self._chunk):
+            chunk = self.schedule[i:i + self.chunk_size]
+            self._chunk = self._np.asarray(chunk, dtype='float64')
+            self._chunk_start = i
+            k = 0
+        return self._chunk.item(k)
+
+    def _trigger_time(self, value):
+        """Convert schedule value into time in the reference of now()."""
+        if self.absolute:
+            return value - self._origin
+        else:
+            return self._origin + value / self._speed
+
+    def _set_origin(self, value, now):
+        """Set time origin so that schedule value corresponds to now."""
+        if self.absolute:  # offset between unix and perf_counter times
+            self._origin = time.time() - now
+        else:
+            self._origin = now - value / self._speed
+
+    # ============================ Public methods ============================
+
+    def run(self):
+        """Run playback (blocking) until end of schedule or stop()."""
+        n = len(self)
+        if n == 0:
+            return
+
+        with self._lock:
+            if self.absolute or not self._index:
+                # relative schedule values count from the start of playback
+                self._set_origin(0, self.now())
+            else:  # seek() called before run(): fire that trigger now
+                self._set_origin(self._value(self._index), self.now())
+
+        while not self.is_stopped:
+
+            if self.is_paused:
+                self._unpause_event.wait()
+                continue
+
+            with self._lock:
+                i = self._index
+                if i >= n:
+                    break
+                value = self._value(i)
+                w = self._trigger_time(value) - self.now()
+
+            if w > 0 and self._wake.wait(w):
+                self._wake.clear()
+                continue  # interrupted: schedule may have changed
+
+            with self._lock:
+                if self._index != i or self.is_paused or self.is_stopped:
+                    continue
+                self._index = i + 1
+
+            self.callback(i, value)
+
+        self.is_stopped = True
+
+    def start(self):
+        """Run playback in a separate thread."""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def join(self, timeout=None):
+        """Wait for playback started with start() to finish."""
+        self._thread.join(timeout)
+
+    def stop(self):
+        """Stop playback immediately."""
+        with self._lock:
+            self.is_stopped = True
+        self._unpause_event.set()
+        self._wake.set()
+
+    def pause(self):
+        """Pause playback, until resume() is called."""
+        with self._lock:
+            if self.is_paused or self.is_stopped:
+                return
+            self._pause_init_time = self.now()
+            self._unpause_event.clear()
+            self.is_paused = True
+        self._wake.set()
+
+    def resume(self):
+        """Resume playback where it was paused.
+
+        In absolute mode, triggers whose time has passed during the pause are
+        skipped.
+        """
+        with self._lock:
+            if not self.is_paused or self.is_stopped:
+                return
+            if self.absolute:
+                n = len(self)
+                t_unix = time.time()
+                while self._index < n and self._value(self._index) < t_unix:
+                    self._index += 1
+            elif self._origin is not None:
+                self._origin += self.now() - self._pause_init_time
+            self.is_paused = False
+        self._unpause_event.set()
+
+    def seek(self, index):
+        """Go to given index in schedule; in relative mode, fire it now."""
+        if not 0 <= index < len(self):
+            raise IndexError('Index {} out of schedule range'.format(index))
+        with self._lock:
+            self._index = index
+            if not self.absolute and self._origin is not None:
+                now = self._pause_init_time if self.is_paused else self.now()
+                self._set_origin(self._value(index), now)
+        self._wake.set()
+
+    @property
+    def index(self):
+        """Index of the next trigger in the schedule."""
+        return self._index
+
+    @property
+    def speed(self):
+        """Playback speed factor, modifiable in real time."""
+        return self._speed
+
+    @speed.setter
+    def speed(self, value):
+        if self.absolute:
+            raise ValueError('Speed factor only possible for relative schedules')
+        if value <= 0:
+            raise ValueError('Speed must be positive')
+        with self._lock:
+            if self._origin is not None:
+                now = self._pause_init_time if self.is_paused else self.now()
+                position = (now - self._origin) * self._speed
+                self._origin = now - position / value
+            self._speed = value
+        self._wake.set()
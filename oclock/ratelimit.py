@@ -0,0 +1,297 @@
+"""Rate limiters (token bucket, leaky bucket, GCRA) with cancellable waiting."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import time
+import threading
+
+from .event import Event
+
+
+# ================================ Base class ================================
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter:
+    """Base class of rate limiters; subclasses define _reserve() and _try().
+
+    Acquisitions are reservations: the release time of the requested tokens
+    is computed (drift-free, from theoretical times) under a lock held only
+    for a few float operations, and waiting is then done outside of the lock,
+    so that many threads can share a limiter. Waits can be cancelled with
+    close().
+    """
+
+    def __init__(self, rate, precise=False):
+        """Init rate limiter.
+
+        Parameters
+        ----------
+        rate : float
+            number of tokens (e.g. requests) per second
+
+        precise : bool
+            if True, waits use oclock.Event (sub-ms precision, but each wait
+            uses a helper thread and busy-waits during the last ms); if
+            False (default), threading.Event
+        """
+        if rate <= 0:
+            raise ValueError('Rate must be positive')
+        self.rate = rate
+        self.is_closed = False
+        self.acquired = 0    # number of tokens acquired
+        self.rejected = 0    # number of acquisitions failed (try, timeout)
+        self._lock = threading.Lock()
+        self._cancel = Event() if precise else threading.Event()
+        self._wait_start = precise  # whether wait() accepts a start time
+        self._futures = set()  # (loop, future) of waiting coroutines
+
+    def __repr__(self):
+        """Str representation of rate limiter object"""
+        s = "{}, rate {}/s, {} acquired, {} rejected" \
+            .format(self.__class__, self.rate, self.acquired, self.rejected)
+        return s
+
+    @staticmethod
+    def now():
+        return time.perf_counter()
+
+    def _reserve(self, n, now, timeout):
+        """Reserve n tokens (call with lock acquired).
+
+        Returns release time, or None if it is more than timeout (s) after
+        now (nothing is reserved in that case).
+        """
+        raise NotImplementedError
+
+    def _try(self, n, now):
+        """Take n tokens if available immediately (call with lock acquired)."""
+        return self._reserve(n, now, 0) is not None
+
+    def try_acquire(self, n=1):
+        """Take n tokens if available now, without waiting; return bool."""
+        now = self.now()
+        with self._lock:
+            ok = self._try(n, now)
+            if ok:
+                self.acquired += n
+            else:
+                self.rejected += 1
+        return ok
+
+    def reserve(self, n=1):
+        """Reserve n tokens; return time (s) to wait before using them.
+
+        Returns None if tokens cannot be reserved (full LeakyBucket).
+        """
+        now = self.now()
+        with self._lock:
+            release = self._reserve(n, now, None)
+            if release is None:
+                self.rejected += 1
+                return None
+            self.acquired += n
+        return release - now
+
+    def acquire(self, n=1, timeout=None):
+        """Wait until n tokens are available and take them.
+
+        Returns False (and takes no tokens) if they are not available within
+        timeout (s), and False if the limiter is closed while waiting.
+        """
+        now = self.now()
+        with self._lock:
+            release = self._reserve(n, now, timeout)
+            if release is None:
+                self.rejected += 1
+                return False
+            self.acquired += n
+        if release > now:
+            if self._wait_start:
+                self._cancel.wait(release - now, now)
+            else:
+                self._cancel.wait(release - now)
+        return not self.is_closed
+
+    async def acquire_async(self, n=1):
+        """Coroutine waiting until n tokens are available (asyncio).
+
+        Returns False if tokens cannot be reserved, or if the limiter is
+        closed while waiting.
+        """
+        delay = self.reserve(n)
+        if delay is None:
+            return False
+        if delay > 0:
+            import asyncio   # only needed for asynchronous waits
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            item = loop, future
+            with self._lock:
+                self._futures.add(item)
+            # closed before registration: close() did not see the future
+            if not self.is_closed:
+                handle = loop.call_later(delay, _resolve, future)
+                try:
+                    await future
+                finally:
+                    handle.cancel()
+            with self._lock:
+                self._futures.discard(item)
+        return not self.is_closed
+
+    def close(self):
+        """Cancel all current and future waits (acquire() and acquire_async()
+        return False)."""
+        self.is_closed = True
+        self._cancel.set()
+        with self._lock:
+            futures = list(self._futures)
+        for loop, future in futures:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:  # event loop already closed
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# ============================= Rate limiters ================================
+
+
+class TokenBucket(RateLimiter):
+    """Token bucket: tokens accumulate at rate, up to burst (bucket size).
+
+    Reserved tokens that are not available yet are taken as debt (negative
+    token count), so that waiting acquisitions are served in order.
+    """
+
+    def __init__(self, rate, burst=1, precise=False):
+        """Init TokenBucket object (initially full).
+
+        Parameters
+        ----------
+        rate, precise : see oclock.ratelimit.RateLimiter
+
+        burst : int
+            bucket size, i.e. max number of tokens that can be acquired at
+            once without waiting
+        """
+        super().__init__(rate, precise=precise)
+        self.burst = burst
+        self._tokens = burst
+        self._last = self.now()
+
+    def _reserve(self, n, now, timeout):
+        if n > self.burst:
+            raise ValueError('Cannot acquire more tokens than burst')
+        tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        delay = max(0, (n - tokens) / self.rate)
+        self._last = now
+        if timeout is not None and delay > timeout:
+            self._tokens = tokens
+            return None
+        self._tokens = tokens - n
+        return now + delay
+
+    @property
+    def tokens(self):
+        """Number of tokens currently available (negative if in debt)."""
+        with self._lock:
+            return min(self.burst, self._tokens + (self.now() - self._last) * self.rate)
+
+
+class LeakyBucket(RateLimiter):
+    """Leaky bucket (as a queue): tokens leave exactly every 1 / rate s.
+
+    Unlike the token bucket, there are no bursts: acquisitions are paced at
+    exactly the rate. The level of the bucket (tokens acquired and not
+    leaked yet) cannot exceed capacity; acquisitions that would overflow it
+    fail (acquire returns False).
+    """
+
+    def __init__(self, rate, capacity=10, precise=False):
+        """Init LeakyBucket object (initially empty).
+
+        Parameters
+        ----------
+        rate, precise : see oclock.ratelimit.RateLimiter
+
+        capacity : int
+            max level of the bucket (in tokens)
+        """
+        super().__init__(rate, precise=precise)
+        self.capacity = capacity
+        self._next = self.now()   # time at which the bucket is empty
+
+    def _reserve(self, n, now, timeout):
+        if n > self.capacity:
+            raise ValueError('Cannot acquire more tokens than capacity')
+        start = max(now, self._next)
+        level = (start - now) * self.rate   # tokens not leaked yet
+        if level + n > self.capacity:
+            return None
+        if timeout is not None and start - now > timeout:
+            return None
+        self._next = start + n / self.rate
+        return start
+
+
+class GCRA(RateLimiter):
+    """Generic Cell Rate Algorithm, with a single state variable (TAT).
+
+    Equivalent to a token bucket of size burst, but only stores the
+    theoretical arrival time (TAT) of the next token, which makes reservations
+    a couple of float operations.
+    """
+
+    def __init__(self, rate, burst=1, precise=False):
+        """Init GCRA object.
+
+        Parameters
+        ----------
+        rate, precise : see oclock.ratelimit.RateLimiter
+
+        burst : int
+            max number of tokens that can be acquired at once without waiting
+        """
+        super().__init__(rate, precise=precise)
+        self.burst = burst
+        self._interval = 1 / rate      # emission interval
+        self._tat = self.now()         # theoretical arrival time
+
+    def _reserve(self, n, now, timeout):
+        if n > self.burst:
+            raise ValueError('Cannot acquire more tokens than burst')
+        tat = max(self._tat, now) + n * self._interval
+        release = max(now, tat - self.burst * self._interval)
+        if timeout is not None and release - now > timeout:
+            return None
+        self._tat = tat
+        return release
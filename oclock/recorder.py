@@ -0,0 +1,234 @@
+"""Record timing of ticks and measurements in memory-mapped binary files."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import os
+import time
+import mmap
+import struct
+from threading import Thread, Lock
+
+from .timer import Timer
+
+
+# ============================== File format =================================
+
+# Header: magic (8 bytes), record size (uint32), reserved (uint32),
+# number of valid records (uint64), reserved (uint64).
+magic = b'OCLKREC1'
+header_format = struct.Struct('<8sIIQQ')
+header_size = header_format.size
+
+# Records: time (unix, ns), lateness (ns), duration (ns), flags
+# - for checkpts: release time, lateness of release, duration of loop body
+#   (time between previous release and checkpt call)
+# - for measure_time(): mean time, 0, duration of the measurement
+record_format = struct.Struct('<qqqQ')
+record_size = record_format.size
+count_format = struct.Struct('<Q')
+count_offset = 16
+
+record_dtype = [('time_ns', '<i8'), ('lateness_ns', '<i8'),
+                ('duration_ns', '<i8'), ('flags', '<u8')]
+
+# Flags
+CHECKPT = 1
+MEASUREMENT = 2
+OVERRUN = 4
+
+
+# ============================= Recorder class ===============================
+
+
+class TickRecorder:
+    """Append fixed-size timing records to a growable memory-mapped file."""
+
+    CHECKPT = CHECKPT
+    MEASUREMENT = MEASUREMENT
+    OVERRUN = OVERRUN
+
+    def __init__(self, path, capacity=100000, flush_interval=1):
+        """Init TickRecorder object; appends to path if it already exists.
+
+        Parameters
+        ----------
+        path : str
+            path of the binary file
+
+        capacity : int
+            initial number of records preallocated in the file (the file
+            size is doubled every time it is full)
+
+        flush_interval : float
+            time interval (s) between flushes to disk, done in a separate
+            thread (None: no background flush)
+        """
+        self.path = path
+        self._lock = Lock()
+        self._previous = {}  # previous release time of each recorded timer
+        self._timers = []    # attached timers, detached by close()
+        self.is_closed = False
+
+        # offset (ns) between unix time and perf_counter time
+        self._offset_ns = time.time_ns() - time.perf_counter_ns()
+
+        exists = os.path.exists(path) and os.path.getsize(path) >= header_size
+        self._file = open(path, 'r+b' if exists else 'w+b')
+
+        if exists:
+            header = header_format.unpack(self._file.read(header_size))
+            if header[0] != magic or header[1] != record_size:
+                self._file.close()
+                raise ValueError('{} is not a valid record file'.format(path))
+            self.count = header[3]
+            size = os.path.getsize(path)
+            capacity = max(capacity, (size - header_size) // record_size)
+        else:
+            self.count = 0
+
+        self._map(max(capacity, self.count, 1))
+
+        self._flush_timer = None
+        if flush_interval is not None:
+            self._flush_timer = Timer(interval=flush_interval,
+                                      name='TickRecorder flush')
+            Thread(target=self._flush_periodically, daemon=True).start()
+
+    def __repr__(self):
+        """Str representation of TickRecorder object"""
+        s = "{}, path '{}', {} records" \
+            .format(self.__class__, self.path, self.count)
+        return s
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _map(self, capacity):
+        """(Re)size file to given capacity and memory-map it."""
+        self._file.truncate(header_size + capacity * record_size)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self.capacity = capacity
+        header_format.pack_into(self._mm, 0, magic, record_size, 0,
+                                self.count, 0)
+
+    def _grow(self):
+        """Double file capacity (call with lock acquired)."""
+        self._mm.flush()
+        self._mm.close()
+        self._map(2 * self.capacity)
+
+    def record(self, time_ns, lateness_ns=0, duration_ns=0, flags=0,
+               pack_record=record_format.pack_into,
+               pack_count=count_format.pack_into):
+        """Append a record (see File format above for contents).
+
+        Records are ignored once the recorder is closed.
+        """
+        with self._lock:
+            if self.is_closed:
+                return
+            n = self.count
+            if n >= self.capacity:
+                self._grow()
+            mm = self._mm
+            pack_record(mm, header_size + n * record_size,
+                        time_ns, lateness_ns, duration_ns, flags)
+            self.count = n + 1
+            pack_count(mm, count_offset, n + 1)
+
+    def __call__(self, timer, entry, scheduled, release):
+        """Record checkpt of timer (use as timer hook, see attach())."""
+        key = id(timer)
+        previous = self._previous.get(key, entry)
+        self._previous[key] = release
+        flags = CHECKPT | OVERRUN if entry >= scheduled else CHECKPT
+        self.record(self._offset_ns + int(release * 1e9),
+                    int((release - scheduled) * 1e9),
+                    int((entry - previous) * 1e9),
+                    flags)
+
+    def attach(self, timer):
+        """Record all checkpts of timer from now on (until detach/close)."""
+        timer.add_hook(self)
+        self._timers.append(timer)
+
+    def detach(self, timer):
+        """Stop recording checkpts of timer."""
+        timer.remove_hook(self)
+        self._timers.remove(timer)
+        self._previous.pop(id(timer), None)
+
+    def flush(self):
+        """Flush records to disk."""
+        with self._lock:
+            if not self.is_closed:
+                self._mm.flush()
+
+    def _flush_periodically(self):
+        timer = self._flush_timer
+        while not timer.is_stopped:
+            timer.checkpt()
+            if not timer.is_stopped:
+                self.flush()
+
+    def close(self):
+        """Detach timers, flush, trim unused preallocated space, close file.
+
+        Calling close() again has no effect.
+        """
+        if self._flush_timer is not None:
+            self._flush_timer.stop()
+        for timer in list(self._timers):
+            self.detach(timer)
+        with self._lock:
+            if self.is_closed:
+                return
+            self.is_closed = True
+            self._mm.flush()
+            self._mm.close()
+            self._file.truncate(header_size + self.count * record_size)
+            self._file.close()
+
+
+# ================================ Reader ====================================
+
+
+def read_ticks(path):
+    """Return records of a TickRecorder file as a numpy structured array.
+
+    The array is a read-only memory map of the file (no copy), with fields
+    'time_ns', 'lateness_ns', 'duration_ns' and 'flags'.
+    """
+    import numpy as np   # only needed for reading
+
+    with open(path, 'rb') as file:
+        header = header_format.unpack(file.read(header_size))
+    if header[0] != magic or header[1] != record_size:
+        raise ValueError('{} is not a valid record file'.format(path))
+    count = header[3]
+
+    if count == 0:
+        return np.empty(0, dtype=record_dtype)
+    return np.memmap(path, dtype=record_dtype, mode='r', offset=header_size,
+                     shape=(count,))
@@ -0,0 +1,364 @@
+"""Drift-free periodic execution of shell commands or python callables."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import signal
+import argparse
+import importlib
+import subprocess
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+
+from .timer import Timer
+from .general import parse_time
+
+
+overrun_policies = ('skip', 'wait', 'kill')
+
+
+# ================================= Workers ==================================
+
+
+class ShellWorker:
+    """Execute a shell command, in a new or in a persistent shell process.
+
+    Processes are started in their own session, so that kill() terminates
+    the command together with its child processes.
+    """
+
+    def __init__(self, command, persistent=False):
+        self.command = command
+        self.persistent = persistent
+        self._process = None
+        self._killed = False
+        self._lock = Lock()   # protects process creation vs. kill()
+        self._marker = 'oclock-{}'.format(uuid.uuid4().hex)
+
+    def _spawn(self, args, **kwargs):
+        """Start process, unless kill() has been called since reset()."""
+        with self._lock:
+            if self._killed:
+                return None
+            self._process = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                             stderr=subprocess.STDOUT,
+                                             text=True, start_new_session=True,
+                                             **kwargs)
+            return self._process
+
+    def _execute_persistent(self):
+        process = self._process
+        if process is None or process.poll() is not None:
+            process = self._spawn(['/bin/sh'], stdin=subprocess.PIPE, bufsize=1)
+            if process is None:
+                return -signal.SIGKILL, ''
+        # command output, then marker with exit status on its own line
+        process.stdin.write("{{ {}\n}} </dev/null 2>&1; printf '\\n%s %d\\n' {} $?\n"
+                            .format(self.command, self._marker))
+        process.stdin.flush()
+        lines = []
+        for line in process.stdout:
+            if line.startswith(self._marker):
+                output = ''.join(lines)[:-1]  # remove newline added by printf
+                return int(line.split()[1]), output
+            lines.append(line)
+        # shell exited (e.g. 'exit' in command) or was killed
+        return process.wait(), ''.join(lines)
+
+    def execute(self):
+        """Run command; return (exit status, output)."""
+        try:
+            if self.persistent:
+                return self._execute_persistent()
+            process = self._spawn(self.command, shell=True,
+                                  stdin=subprocess.DEVNULL)
+            if process is None:
+                return -signal.SIGKILL, ''
+            output, _ = process.communicate()
+            return process.returncode, output
+        except (OSError, ValueError) as error:  # e.g. pipe closed by kill()
+            return -1, str(error)
+
+    def reset(self):
+        """Allow execution again after kill()."""
+        self._killed = False
+
+    def kill(self):
+        """Kill running (or about to start) command and its children."""
+        with self._lock:
+            self._killed = True
+            process = self._process
+            if process is not None and process.poll() is None:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def close(self):
+        process = self._process
+        if self.persistent and process is not None and process.poll() is None:
+            process.stdin.close()
+            process.wait()
+
+
+class CallableWorker:
+    """Call a python function (status 1 if exception, else int result or 0)."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def execute(self):
+        try:
+            result = self.function()
+        except Exception as error:
+            return 1, repr(error)
+        if isinstance(result, int) and not isinstance(result, bool):
+            return result, ''
+        return 0, '' if result is None else str(result)
+
+    def reset(self):
+        pass
+
+    def kill(self):
+        raise ValueError('Python callables cannot be killed')
+
+    def close(self):
+        pass
+
+
+# ============================== Runner class ================================
+
+
+class Runner:
+    """Run a shell command or python callable on a drift-free Timer grid.
+
+    A timing record is written as a JSON line for every tick: tick index,
+    scheduled and start times (unix), lateness, duration (s), exit status
+    and output of the command, or 'skipped': true if the tick was skipped
+    because all workers were busy.
+    """
+
+    def __init__(self, command, interval=1, persistent=False, concurrency=1,
+                 overrun='skip', output=None, precise=False):
+        """Init Runner object.
+
+        Parameters
+        ----------
+        command : str or callable
+            shell command (str) or python callable without arguments
+
+        interval : float
+            time interval (s) between executions
+
+        persistent : bool
+            if True, shell commands are executed in persistent shell
+            processes (one per worker) to avoid process startup at each tick
+
+        concurrency : int
+            max number of executions running at the same time
+
+        overrun : str
+            what to do when a tick occurs while all workers are busy:
+            - 'skip': skip the tick
+            - 'wait': wait for a worker to be free (next ticks can be missed)
+            - 'kill': kill the oldest running execution (shell commands only)
+
+        output : file-like object
+            where JSON lines are written (default: sys.stdout)
+
+        precise : bool
+            see oclock.Timer
+        """
+        if overrun not in overrun_policies:
+            raise ValueError('Overrun policy must be in {}'.format(overrun_policies))
+        if overrun == 'kill' and callable(command):
+            raise ValueError("Overrun policy 'kill' only for shell commands")
+        self.command = command
+        self.concurrency = concurrency
+        self.overrun = overrun
+        self.output = sys.stdout if output is None else output
+        self.timer = Timer(interval=interval, name='Runner', precise=precise)
+
+        if callable(command):
+            workers = [CallableWorker(command) for _ in range(concurrency)]
+        else:
+            workers = [ShellWorker(command, persistent=persistent)
+                       for _ in range(concurrency)]
+        self.workers = workers
+        self._free = queue.Queue()
+        for worker in workers:
+            self._free.put(worker)
+        self._busy = {}   # worker: scheduled time, for 'kill' policy
+        self._lock = Lock()
+
+        # counters
+        self.executions = 0
+        self.failures = 0   # non-zero exit status
+        self.skipped = 0
+
+        # offset (s) between unix time and Timer.now() time
+        self._offset = time.time() - self.timer.now()
+
+    def __repr__(self):
+        """Str representation of Runner object"""
+        s = "{}, command {!r}, interval {}s, concurrency {}, overrun '{}'" \
+            .format(self.__class__, self.command, self.timer.interval,
+                    self.concurrency, self.overrun)
+        return s
+
+    def _write(self, record):
+        line = json.dumps(record)
+        with self._lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def _get_worker(self):
+        """Free worker according to overrun policy, None if tick skipped."""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            if self.overrun == 'skip':
+                return None
+            if self.overrun == 'kill':
+                with self._lock:
+                    oldest = min(self._busy, key=self._busy.get, default=None)
+                if oldest is not None:
+                    oldest.kill()
+            return self._free.get()
+
+    def _execute(self, worker, index, scheduled):
+        start = self.timer.now()
+        status, output = -1, ''
+        try:
+            status, output = worker.execute()
+        finally:
+            end = self.timer.now()
+            with self._lock:
+                del self._busy[worker]
+                self.executions += 1
+                if status != 0:
+                    self.failures += 1
+            self._free.put(worker)
+        self._write({'tick': index,
+                     'scheduled': scheduled + self._offset,
+                     'start': start + self._offset,
+                     'lateness': start - scheduled,
+                     'duration': end - start,
+                     'status': status,
+                     'output': output})
+
+    def run(self, count=None, duration=None):
+        """Execute command at each tick (blocking) until stop(), or count
+        ticks, or duration (s) (see Timer.ticks())."""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            self.timer.reset()
+            for tick in self.timer.ticks(count=count, duration=duration):
+                index, scheduled = tick.index, tick.scheduled
+                worker = self._get_worker()
+                if worker is None:
+                    self.skipped += 1
+                    self._write({'tick': index,
+                                 'scheduled': scheduled + self._offset,
+                                 'skipped': True})
+                    continue
+                worker.reset()
+                with self._lock:
+                    self._busy[worker] = scheduled
+                pool.submit(self._execute, worker, index, scheduled)
+        for worker in self.workers:
+            worker.close()
+
+    def stop(self):
+        self.timer.stop()
+
+
+# ========================== Command line interface ==========================
+
+
+def _load_callable(path):
+    """Load python callable from 'module:function' str."""
+    module_name, _, name = path.partition(':')
+    if not name:
+        raise ValueError(f'{path} not of the form module:function')
+    function = importlib.import_module(module_name)
+    for attribute in name.split('.'):
+        function = getattr(function, attribute)
+    return function
+
+
+def _parse_seconds(value):
+    """Duration in seconds (float) or in the h:m:s format."""
+    if ':' in value:
+        return parse_time(value).total_seconds()
+    return float(value)
+
+
+def main(argv=None):
+    """Command line interface, e.g. python -m oclock run -i 0.1 -- cmd"""
+    descr = "Run a command periodically on a drift-free timer grid, " \
+            "printing per-tick timing as JSON lines."
+    parser = argparse.ArgumentParser(prog='python -m oclock run',
+                                     description=descr)
+
+    parser.add_argument('command', nargs='+',
+                        help="shell command (or module:function with --python)")
+    parser.add_argument('-i', '--interval', type=_parse_seconds, default=1,
+                        help="interval in s, or h:m:s (default 1)")
+    parser.add_argument('-n', '--count', type=int,
+                        help="number of ticks (default: run until Ctrl+C)")
+    parser.add_argument('-d', '--duration', type=_parse_seconds,
+                        help="total duration in s, or h:m:s")
+    parser.add_argument('-j', '--concurrency', type=int, default=1,
+                        help="max number of simultaneous executions")
+    parser.add_argument('--overrun', choices=overrun_policies, default='skip',
+                        help="policy when all workers are busy (default skip)")
+    parser.add_argument('--persistent', action='store_true',
+                        help="run commands in persistent shells (no startup cost)")
+    parser.add_argument('--python', action='store_true',
+                        help="command is a python callable module:function")
+    parser.add_argument('-o', '--output', type=str,
+                        help="file where JSON lines are appended (default stdout)")
+    parser.add_argument('--precise', action='store_true',
+                        help="increased timer precision")
+
+    args = parser.parse_args(argv)
+
+    if args.python:
+        command = _load_callable(args.command[0])
+    else:
+        command = ' '.join(args.command)
+
+    output = None if args.output is None else open(args.output, 'a')
+    runner = Runner(command, interval=args.interval, persistent=args.persistent,
+                    concurrency=args.concurrency, overrun=args.overrun,
+                    output=output, precise=args.precise)
+    try:
+        runner.run(count=args.count, duration=args.duration)
+    except KeyboardInterrupt:
+        runner.stop()
+    finally:
+        if output is not None:
+            output.close()
@@ -0,0 +1,363 @@
+"""Calendar (cron-like) schedules and single-thread dispatcher of jobs."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import time
+import math
+import heapq
+import itertools
+import traceback
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from threading import Thread, Condition
+
+from .general import parse_time
+
+
+day_names = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+day_groups = {'weekdays': range(5), 'weekends': range(5, 7)}
+
+missed_policies = ('skip', 'run_once', 'run_all')
+
+
+# ============================ Calendar schedules ============================
+
+
+def _parse_days(days_str):
+    """Transform e.g. 'mon,wed' or 'weekdays' into a set of weekday numbers."""
+    days = set()
+    for name in days_str.lower().split(','):
+        if name in day_groups:
+            days.update(day_groups[name])
+        elif name in day_names:
+            days.add(day_names.index(name))
+        else:
+            raise ValueError(f'{name} not a valid day (e.g. mon, weekdays)')
+    return days
+
+
+def _seconds(time_str):
+    """Time of day or duration in the form h:m:s into seconds (float)."""
+    return parse_time(time_str).total_seconds()
+
+
+class Calendar:
+    """Recurring fire times defined by a str spec using the h:m:s format.
+
+    Specs are of the form
+    - 'every <h:m:s>': e.g. 'every :15:' for every 15 minutes (:00, :15 etc.)
+    - 'every <h:m:s> between <h:m:s> and <h:m:s>': e.g.
+      'every :15: between 8:: and 18::' (08:00, 08:15, ..., 18:00)
+    - 'at <h:m:s>[,<h:m:s>...] [daily]': e.g. 'at 2:30: daily' or
+      'at 8::,12:30:'
+    optionally followed by 'on <days>', with days e.g. 'mon,wed,fri',
+    'weekdays' or 'weekends'. Times of day are local times; periods are
+    aligned on midnight, or on the start of the between window.
+    """
+
+    def __init__(self, spec):
+        """Init Calendar object from spec (see class docstring)."""
+        self.spec = spec
+        self.days = set(range(7))
+        self.times = None    # sorted times of day (s), for 'at' specs
+        self.period = None   # period (s), for 'every' specs
+        self.window = (0, None)  # (start, end) time of day (s), end included
+
+        words = spec.split()
+        if 'on' in words:
+            i = words.index('on')
+            if i != len(words) - 2:
+                raise ValueError(f"'on' must be followed by days in {spec}")
+            self.days = _parse_days(words[-1])
+            words = words[:i]
+        if words and words[-1] == 'daily':
+            words = words[:-1]
+
+        if len(words) == 2 and words[0] == 'at':
+            self.times = sorted(_seconds(s) for s in words[1].split(','))
+        elif len(words) in (2, 6) and words[0] == 'every':
+            self.period = _seconds(words[1])
+            if self.period <= 0:
+                raise ValueError(f'Period must be positive in {spec}')
+            if len(words) == 6:
+                if words[2] != 'between' or words[4] != 'and':
+                    raise ValueError(f'{spec} not a valid calendar spec')
+                self.window = (_seconds(words[3]), _seconds(words[5]))
+        else:
+            raise ValueError(f'{spec} not a valid calendar spec')
+
+    def __repr__(self):
+        """Str representation of Calendar object"""
+        return "{}, spec '{}'".format(self.__class__, self.spec)
+
+    def _first_in_day(self, after=None):
+        """First fire time of day (s) strictly after given time of day (s).
+
+        If after is None, first fire time of the day; returns None if there
+        is no fire time left in the day.
+        """
+        if self.times is not None:
+            i = 0 if after is None else bisect_right(self.times, after)
+            return self.times[i] if i < len(self.times) else None
+
+        start, end = self.window
+        if after is None or after < start:
+            k = 0
+        else:
+            k = math.floor((after - start) / self.period) + 1
+        t = start + k * self.period
+        # float rounding (datetimes have a microsecond resolution)
+        while after is not None and round(t, 6) <= after:
+            k += 1
+            t = start + k * self.period
+        if end is None:
+            return t if t < 86400 else None
+        return t if t <= end else None
+
+    def next_after(self, dt):
+        """Next fire time (naive local datetime) strictly after datetime dt."""
+        day = datetime.combine(dt.date(), datetime.min.time())
+        after = (dt - day).total_seconds()
+        for i in range(8):
+            if day.weekday() in self.days:
+                t = self._first_in_day(after if i == 0 else None)
+                if t is not None:
+                    return day + timedelta(seconds=t)
+            day += timedelta(days=1)
+        raise ValueError(f'No fire time in calendar {self.spec}')
+
+    def upcoming(self, n=10, after=None):
+        """List of the next n fire times (datetimes) after given datetime."""
+        dt = datetime.now() if after is None else after
+        times = []
+        for _ in range(n):
+            dt = self.next_after(dt)
+            times.append(dt)
+        return times
+
+
+# ============================== Scheduled jobs ==============================
+
+
+class Job:
+    """Function executed at the fire times of a calendar (see Scheduler.add())."""
+
+    def __init__(self, calendar, function, args=None, kwargs=None, name=None,
+                 missed='skip', offload=False):
+        if missed not in missed_policies:
+            raise ValueError('Missed-run policy must be in {}'.format(missed_policies))
+        self.calendar = calendar
+        self.function = function
+        self.args = () if args is None else args
+        self.kwargs = {} if kwargs is None else kwargs
+        self.name = getattr(function, '__name__', 'job') if name is None else name
+        self.missed_policy = missed
+        self.offload = offload
+        self.next_time = None    # next fire time (datetime)
+        self.is_cancelled = False
+
+        # counters
+        self.runs = 0      # number of executions
+        self.missed = 0    # fire times missed (e.g. suspend) and not executed
+        self.errors = 0    # executions that raised an exception
+
+    def __repr__(self):
+        """Str representation of Job object"""
+        s = "{}, name '{}', spec '{}', next {}" \
+            .format(self.__class__, self.name, self.calendar.spec, self.next_time)
+        return s
+
+    def execute(self):
+        self.runs += 1
+        try:
+            self.function(*self.args, **self.kwargs)
+        except Exception:
+            self.errors += 1
+            traceback.print_exc()
+
+
+class Scheduler:
+    """Dispatch any number of calendar jobs from a single thread.
+
+    Next fire times of all jobs are kept in a heap (O(log n) insertion and
+    next-event lookup). Waiting is done on the wall clock in chunks of at
+    most check_interval, so that clock steps and suspends are detected; fire
+    times missed by more than tolerance are then handled according to the
+    missed-run policy of each job:
+    - 'skip': missed runs are not executed
+    - 'run_once': a single run is executed for all missed runs
+    - 'run_all': all missed runs are executed in a row
+    """
+
+    def __init__(self, tolerance=1, check_interval=1, max_workers=None):
+        """Init Scheduler object (dispatch starts with run() or start()).
+
+        Parameters
+        ----------
+        tolerance : float
+            lateness (s) above which a fire time is considered missed
+
+        check_interval : float
+            max time (s) between checks of the wall clock
+
+        max_workers : int
+            max number of threads executing offloaded jobs
+            (see concurrent.futures.ThreadPoolExecutor)
+        """
+        self.tolerance = tolerance
+        self.check_interval = check_interval
+        self.max_workers = max_workers
+        self.jobs = []
+        self.is_stopped = False
+        self._heap = []                  # (unix time, sequence number, job)
+        self._counter = itertools.count()  # avoids comparing jobs in heap
+        self._condition = Condition()
+        self._thread = None
+
+    def __repr__(self):
+        """Str representation of Scheduler object"""
+        s = "{}, {} jobs, tolerance {}s" \
+            .format(self.__class__, len(self.jobs), self.tolerance)
+        return s
+
+    def _push(self, job, after):
+        """Schedule next run of job after datetime (call with lock acquired)."""
+        job.next_time = job.calendar.next_after(after)
+        item = (job.next_time.timestamp(), next(self._counter), job)
+        heapq.heappush(self._heap, item)
+
+    def add(self, spec, function, args=None, kwargs=None, name=None,
+            missed='skip', offload=False, start=None):
+        """Execute function at the fire times of spec.
+
+        Parameters
+        ----------
+        spec : str or oclock.Calendar
+            calendar spec, e.g. 'every :15: between 8:: and 18::' or
+            'at 2:30: daily' (see oclock.Calendar)
+
+        function : callable
+            function to execute
+
+        args, kwargs : tuple, dict
+            arguments passed to function
+
+        name : str
+            job name (default: function name)
+
+        missed : str
+            missed-run policy, 'skip', 'run_once' or 'run_all'
+
+        offload : bool
+            if True, execute job in a thread pool instead of the dispatching
+            thread (for slow jobs)
+
+        start : datetime.datetime
+            time after which fire times are considered (default: now)
+
+        Returns
+        -------
+        oclock.schedule.Job
+        """
+        calendar = spec if isinstance(spec, Calendar) else Calendar(spec)
+        job = Job(calendar, function, args=args, kwargs=kwargs, name=name,
+                  missed=missed, offload=offload)
+        with self._condition:
+            self.jobs.append(job)
+            self._push(job, datetime.now() if start is None else start)
+            self._condition.notify()
+        return job
+
+    def remove(self, job):
+        """Cancel future runs of job."""
+        with self._condition:
+            job.is_cancelled = True
+            self.jobs.remove(job)
+
+    def _next_due(self):
+        """Wait for next due job; return (job, number of runs) or (None, 0)."""
+        heap = self._heap
+        with self._condition:
+            while not self.is_stopped:
+                if not heap:
+                    self._condition.wait(self.check_interval)
+                    continue
+                t, _, job = heap[0]
+                if job.is_cancelled:
+                    heapq.heappop(heap)
+                    continue
+                now = time.time()
+                if now < t:
+                    self._condition.wait(min(t - now, self.check_interval))
+                    continue
+                heapq.heappop(heap)
+                if now - t <= self.tolerance:
+                    self._push(job, job.next_time)
+                    return job, 1
+                # missed fire times (e.g. suspend or clock step)
+                dt_now = datetime.fromtimestamp(now)
+                missed = 1
+                next_time = job.calendar.next_after(job.next_time)
+                while next_time <= dt_now:
+                    missed += 1
+                    next_time = job.calendar.next_after(next_time)
+                self._push(job, dt_now)
+                runs = {'skip': 0, 'run_once': 1, 'run_all': missed}[job.missed_policy]
+                job.missed += missed - runs
+                if runs:
+                    return job, runs
+        return None, 0
+
+    def run(self):
+        """Dispatch jobs (blocking) until stop() is called."""
+        # only needed when running
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                job, runs = self._next_due()
+                if job is None:
+                    return
+                for _ in range(runs):
+                    if job.offload:
+                        pool.submit(job.execute)
+                    else:
+                        job.execute()
+
+    def start(self):
+        """Dispatch jobs in a separate thread."""
+        self.is_stopped = False
+        self._thread = Thread(target=self.run)
+        self._thread.start()
+
+    def stop(self):
+        """Stop dispatching jobs (waits for running jobs to finish)."""
+        with self._condition:
+            self.is_stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """Counters of each job (by name)."""
+        return {job.name: {'runs': job.runs, 'missed': job.missed,
+                           'errors': job.errors, 'next': job.next_time}
+                for job in self.jobs}
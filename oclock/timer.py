@@ -23,12 +23,53 @@
 import time
 import threading
 from .event import Event
+from .coalesce import get_coalescer
+
+
+class Tick:
+    """Information on a checkpt release, yielded by Timer.ticks().
+
+    Attributes
+    ----------
+    index : int
+        number of the tick since the beginning of the iteration
+
+    scheduled : float
+        time at which the release was scheduled (ref. of Timer.now())
+
+    release : float
+        actual release time (ref. of Timer.now())
+
+    lateness : float
+        release - scheduled (s)
+
+    missed : int
+        number of full intervals missed because the loop body took too long
+    """
+
+    __slots__ = ('index', 'scheduled', 'release', 'lateness', 'missed')
+
+    def __repr__(self):
+        """Str representation of Tick object"""
+        s = "{}, index {}, scheduled {}, release {}, lateness {}s, missed {}" \
+            .format(self.__class__, self.index, self.scheduled, self.release,
+                    self.lateness, self.missed)
+        return s
 
 
 class Timer:
     """Timer that is cancellable and modifiable in real time."""
 
-    def __init__(self, interval=1, name='Timer', warnings=False, precise=False):
+    __slots__ = (
+        '_interval', '_interval_failed', '_wait_start', 'warnings', 'name',
+        '_hooks', '_entry_hooks', '_bypass_checkpt', '_unpause_event', '_lock', '_seq',
+        'start_time', 'stop_time', '_target', 'next_checkpt_release',
+        '_pause_time', '_pause_init_time', 'is_paused', 'is_stopped',
+        '_block_offsets', 'slack', '_coalescer', '__weakref__',
+    )
+
+    def __init__(self, interval=1, name='Timer', warnings=False, precise=False,
+                 selectable=False, slack=0, coalescer=None):
         """Init oclock.Timer object.
 
         Parameters
@@ -48,6 +89,22 @@ class Timer:
         precise : bool
             if True, increase time precision ; useful for Windows
             (default False)
+
+        selectable : bool
+            if True, internal events are file-descriptor based (FdEvent), so
+            that cancellations of checkpt waits can be detected with select,
+            selectors or asyncio, see Timer.fileno(); Unix only, takes
+            precedence over precise (default False)
+
+        slack : float
+            tolerance (s) on release times: checkpts can be released up to
+            slack after their scheduled time, so that the wakeups of timers
+            with nearby scheduled times are coalesced into a single one (see
+            oclock.coalesce.Coalescer); the drift-free grid of scheduled times
+            is not affected (default 0, no coalescing)
+
+        coalescer : oclock.coalesce.Coalescer
+            coalescer used if slack > 0 (default: process-wide coalescer)
         """
         self._interval = interval
         self._interval_failed = False
@@ -55,12 +112,40 @@ class Timer:
         self.warnings = warnings
         self.name = name
 
+        # functions called after each checkpt, see add_hook()
+        self._hooks = []
+        self._entry_hooks = []  # checkpt_entry() methods of hooks, if any
+
+        if selectable:
+            from .fdevent import FdEvent   # only needed for selectable timers
+            event_class = FdEvent
+        elif precise:
+            event_class = Event
+        else:
+            event_class = threading.Event
+
+        # whether event wait() accepts a start time (avoids reading the clock)
+        self._wait_start = event_class is not threading.Event
+
         # used to bypass waiting time when changes or stopping are required
-        self._bypass_checkpt = Event() if precise else threading.Event()
+        self._bypass_checkpt = event_class()
         # used to wait for timer reactivation when in a paused state
-        self._unpause_event = Event() if precise else threading.Event()
+        self._unpause_event = event_class()
+
+        # protects state transitions (pause, resume, stop, interval etc.)
+        self._lock = threading.Lock()
+        self._seq = 0  # incremented before and after each state modification
+        self.stop_time = None
+        self._pause_init_time = None
+        self._block_offsets = None  # tick offsets within block, see checkpt_block()
 
-        self._start()      # Timer starts automatically upon init
+        self.slack = slack
+        if slack and coalescer is None:
+            coalescer = get_coalescer()
+        self._coalescer = coalescer if slack else None
+
+        with self._lock:
+            self._start()      # Timer starts automatically upon init
 
     def __repr__(self):
         """Str representation of Timer object"""
@@ -70,52 +155,97 @@ class Timer:
         return s
 
     def _start(self):
-        """Start timer (not for public use)."""
+        """Start timer (not for public use, call with self._lock acquired)."""
+        # clock reads and event calls are done outside of the odd-sequence
+        # window, so that readers (see _snapshot()) retry as little as possible
+        self._bypass_checkpt.clear()
         now = self.now()
+        self._seq += 1  # odd: state being modified, see _snapshot()
         self.start_time = now
         self._target = now + self._interval
         self.next_checkpt_release = self._target
         self._pause_time = 0
-        self._bypass_checkpt.clear()
         self.is_paused = False
         self.is_stopped = False
+        self._seq += 1
+
+    def _snapshot(self):
+        """Consistent view of the timer state for readers (seqlock-style).
+
+        Returns (start_time, stop_time, is_stopped, is_paused, pause_time,
+        pause_init_time). Readers do not take the lock: they retry if the
+        state has been modified while reading.
+        """
+        while True:
+            seq = self._seq
+            if not seq & 1:  # else, writer in progress
+                state = (self.start_time, self.stop_time, self.is_stopped,
+                         self.is_paused, self._pause_time, self._pause_init_time)
+                if self._seq == seq:
+                    return state
+            time.sleep(0)  # yield, e.g. to let the writer thread finish
 
     def reset(self):
         """Reset timer immediately."""
-        if self.is_paused:
-            self.resume()
-        self._bypass_checkpt.set()
-        self._start()
+        with self._lock:
+            self._resume()
+            self._bypass_checkpt.set()
+            self._start()
 
     def stop(self):
         """Stop timer immediately."""
-        if self.is_paused:
-            self.resume()
-        self._unpause_event.set()      # in case stop is called in a paused state
-        self._bypass_checkpt.set()  # cancel any remaining wait at the checkpt
-        self.stop_time = self.now()
-        self.is_stopped = True
+        with self._lock:
+            self._resume()
+            now = self.now()
+            self._seq += 1
+            self.stop_time = now
+            self.is_stopped = True
+            self._seq += 1
+            self._unpause_event.set()  # in case stop is called in a paused state
+            self._bypass_checkpt.set()  # cancel any remaining wait at the checkpt
 
     def pause(self):
         """Pause timer immediately, until it is resumed with resume()."""
         # do nothing if timer is already paused (also inactive if timer stopped)
-        if not self.is_paused and not self.is_stopped:
-            self._bypass_checkpt.set()
-            self._unpause_event.clear()
-            self._pause_init_time = self.now()
-            self.is_paused = True
+        with self._lock:
+            if not self.is_paused and not self.is_stopped:
+                self._unpause_event.clear()
+                now = self.now()
+                self._seq += 1
+                self._pause_init_time = now
+                self.is_paused = True
+                self._seq += 1
+                self._bypass_checkpt.set()
 
     def resume(self):
         """Resume timer after pause event."""
+        with self._lock:
+            self._resume()
+
+    def _resume(self):
+        """Resume timer (call with self._lock acquired)."""
         # do nothing if timer is not paused (also inactive if timer stopped)
         if self.is_paused and not self.is_stopped:
-            self._pause_time += self.now() - self._pause_init_time
+            now = self.now()
+            self._seq += 1
+            self._pause_time += now - self._pause_init_time
             self.is_paused = False
+            self._seq += 1
             self._unpause_event.set()
 
     def checkpt(self):
         """Waits at current point in program to keep the interval constant."""
 
+        # NOTE: hot path; the clock is read only once (plus once after
+        # release if hooks are defined), and the lock is held only briefly.
+
+        entry = self.now()
+        lock = self._lock
+        bypass = self._bypass_checkpt
+
+        for entry_hook in self._entry_hooks:
+            entry_hook()
+
         if self.is_paused:  # if timer is paused, wait for reactivation by resume()
 
             self._unpause_event.wait()
@@ -123,61 +253,306 @@ class Timer:
             # The two lines below (target adjustment and else statement) make
             # the program liberate the checkpt immediately after a pause, and
             # sets the next checkpt one interval away
-            self._target = self.now() + self._interval
+            now = self.now()
+            with lock:
+                scheduled = now  # no lateness when released by resume()
+                self._target = now + self._interval
 
         else:
 
-            if not self.interval_exceeded:
-
-                # if time before the previous checkpt has not exceeded the
-                # required interval, set target to another multiple of dt
+            with lock:
+                scheduled = self._target
+                if entry < scheduled:
+                    # if time before the previous checkpt has not exceeded the
+                    # required interval, set target to another multiple of dt
+                    self._target = scheduled + self._interval
+                    exceeded = False
+                else:
+                    # if already passed target, move on immediately and set
+                    # target at a time dt from current time to try again.
+                    self._target = entry + self._interval
+                    exceeded = True
+
+            if exceeded is not self._interval_failed:
+                self._warn(exceeded)
+
+            if not exceeded:
+                if self._coalescer is not None:
+                    self._coalescer.wait(bypass, scheduled, self.slack)
+                elif self._wait_start:  # avoids reading the clock again in wait()
+                    bypass.wait(scheduled - entry, entry)
+                else:
+                    bypass.wait(scheduled - entry)
 
-                if self.warnings and self._interval_failed:
-                    # only called when interval is ok again after having failed
-                    print("--- Time interval ({}s) OK again for {}"
-                          .format(self.interval, self.name))
-                self._interval_failed = False
+        # always reset the bypass event after a checkpt
+        with lock:
+            if bypass.is_set():
+                bypass.clear()
+            self.next_checkpt_release = self._target
+
+        hooks = self._hooks
+        if hooks:
+            release = self.now()
+            for hook in hooks:
+                hook(self, entry, scheduled, release)
+
+    def _warn(self, exceeded):
+        """Print warning when interval starts failing or is OK again."""
+        self._interval_failed = exceeded
+        if not self.warnings:
+            return
+        if exceeded:
+            # only called when interval fails right after being ok
+            print("--- Warning, time interval ({}s) too short for {}"
+                  .format(self.interval, self.name))
+        else:
+            # only called when interval is ok again after having failed
+            print("--- Time interval ({}s) OK again for {}"
+                  .format(self.interval, self.name))
 
-                w = self._target - self.now()
-                self._target += self._interval
-                self._bypass_checkpt.wait(w)
+    def ticks(self, count=None, duration=None, deadline=None):
+        """Iterate over checkpt releases, as an alternative to checkpt().
 
+        Parameters
+        ----------
+        count : int
+            maximum number of ticks (default: no limit)
+
+        duration : float
+            maximum duration (s) of iteration, counted from the call
+            (default: no limit)
+
+        deadline : float
+            time (in the reference of Timer.now()) after which iteration stops
+            (default: no limit)
+
+        Yields
+        ------
+        oclock.timer.Tick
+            the SAME object is yielded at each iteration (to avoid allocations)
+            with its attributes updated; copy values if they must be stored.
+
+        Iteration also stops when the timer is stopped. The clock is read once
+        when the loop body gives control back, and a second time only if
+        a wait was necessary, to timestamp the actual release.
+
+        Examples
+        --------
+        >>> timer = Timer(interval=0.01)
+        >>> for tick in timer.ticks(count=100):
+        >>>     print(tick.index, tick.lateness, tick.missed)
+        """
+        now = self.now
+        lock = self._lock
+        bypass = self._bypass_checkpt
+
+        t_end = float('inf') if deadline is None else deadline
+        if duration is not None:
+            t_end = min(t_end, now() + duration)
+        count = float('inf') if count is None else count
+
+        tick = Tick()
+        index = 0
+
+        while index < count and not self.is_stopped:
+
+            t = now()
+            if t >= t_end:
+                return
+
+            hooks = self._hooks
+            entry = t
+            for entry_hook in self._entry_hooks:
+                entry_hook()
+
+            if self.is_paused:
+                self._unpause_event.wait()
+                t = now()
+                with lock:
+                    scheduled = t
+                    self._target = t + self._interval
+                missed = 0
             else:
+                with lock:
+                    scheduled = self._target
+                    interval = self._interval
+                    exceeded = t >= scheduled
+                    if exceeded:
+                        self._target = t + interval
+                    elif scheduled <= t_end:
+                        self._target = scheduled + interval
+                    else:
+                        return
+                if exceeded != self._interval_failed:
+                    self._warn(exceeded)
+                if exceeded:
+                    missed = int((t - scheduled) / interval) if interval else 0
+                else:
+                    if self._coalescer is not None:
+                        self._coalescer.wait(bypass, scheduled, self.slack)
+                    else:
+                        bypass.wait(scheduled - t)
+                    t = now()
+                    missed = 0
+
+            if self.is_stopped:
+                return
+
+            with lock:
+                bypass.clear()
+                self.next_checkpt_release = self._target
+
+            tick.index = index
+            tick.scheduled = scheduled
+            tick.release = t
+            tick.lateness = t - scheduled
+            tick.missed = missed
+
+            for hook in hooks:
+                hook(self, entry, scheduled, t)
+
+            yield tick
+            index += 1
+
+    def checkpt_block(self, size, out=None):
+        """Wait for the end of a block of size ticks (batched checkpt).
+
+        Ticks are spaced by the timer interval on the same drift-free grid as
+        checkpt(), but the timer releases only once per block, at the
+        scheduled time of the last tick of the block. This allows vectorized
+        loop bodies at tick rates beyond what per-tick wakeups allow.
 
-                # if already passed target, move on immediately and set target
-                # at a time dt from current time to try again.
+        Parameters
+        ----------
+        size : int
+            number of ticks per block
 
-                if self.warnings and not self._interval_failed:
-                    # only called when interval fails right after being ok
-                    print("--- Warning, time interval ({}s) too short for {}"
-                          .format(self.interval, self.name))
-                self._interval_failed = True
+        out : numpy array of floats (optional)
+            preallocated array of length size where timestamps are written
+            (avoids an allocation at each block)
 
-                self._target = self.now() + self.interval
+        Returns
+        -------
+        (numpy.ndarray, float)
+            scheduled times of the size ticks of the block, and actual release
+            time (all in the reference of Timer.now())
 
-        # always reset the bypass event after a checkpt
-        self._bypass_checkpt.clear()
-        self.next_checkpt_release = self._target
+        As with checkpt(), if the loop body takes longer than the block, the
+        timer releases immediately and the grid restarts one interval later.
+        """
+        import numpy as np   # only needed for batched ticks
+
+        offsets = self._block_offsets
+        if offsets is None or len(offsets) != size:
+            offsets = self._block_offsets = np.arange(size, dtype=float)
+        if out is None:
+            out = np.empty(size)
+
+        entry = self.now()
+        lock = self._lock
+        bypass = self._bypass_checkpt
+
+        for entry_hook in self._entry_hooks:
+            entry_hook()
+
+        if self.is_paused:
+            self._unpause_event.wait()
+            now = self.now()
+            with lock:
+                interval = self._interval
+                scheduled = now   # block ends at release after a pause
+                first = now - (size - 1) * interval
+                self._target = now + interval
+        else:
+            with lock:
+                interval = self._interval
+                first = self._target
+                scheduled = first + (size - 1) * interval
+                exceeded = entry >= scheduled
+                if exceeded:
+                    self._target = entry + interval
+                else:
+                    self._target = scheduled + interval
+
+            if exceeded is not self._interval_failed:
+                self._warn(exceeded)
+
+            if not exceeded:
+                if self._coalescer is not None:
+                    self._coalescer.wait(bypass, scheduled, self.slack)
+                elif self._wait_start:
+                    bypass.wait(scheduled - entry, entry)
+                else:
+                    bypass.wait(scheduled - entry)
+
+        with lock:
+            if bypass.is_set():
+                bypass.clear()
+            self.next_checkpt_release = self._target
+
+        np.multiply(offsets, interval, out=out)
+        out += first
+
+        release = self.now()
+        for hook in self._hooks:
+            hook(self, entry, scheduled, release)
+
+        return out, release
+
+    def add_hook(self, hook):
+        """Add function to be called (in the checkpt thread) after each checkpt.
+
+        The function is called as hook(timer, entry, scheduled, release),
+        with entry the time at which checkpt() was called, scheduled the time
+        at which it was supposed to release, and release the actual release
+        time (all times in the reference of Timer.now()). Hooks must be cheap,
+        because they are executed within the timed loop.
+
+        If the hook has a checkpt_entry() method, it is also called (without
+        arguments) when checkpt() is called, before waiting, e.g. to measure
+        the loop body without the wait (see oclock.cputime.CpuBreakdown).
+        """
+        entry_hook = getattr(hook, 'checkpt_entry', None)
+        if entry_hook is not None:
+            self._entry_hooks = self._entry_hooks + [entry_hook]
+        self._hooks = self._hooks + [hook]  # copy, to not disturb checkpt
+
+    def remove_hook(self, hook):
+        """Remove function previously added with add_hook()."""
+        hooks = list(self._hooks)
+        hooks.remove(hook)
+        entry_hook = getattr(hook, 'checkpt_entry', None)
+        if entry_hook is not None:
+            entry_hooks = list(self._entry_hooks)
+            entry_hooks.remove(entry_hook)
+            self._entry_hooks = entry_hooks
+        self._hooks = hooks
 
     @property
     def pause_time(self):
         """Total duration (s) during which the timer has been paused."""
-        if self.is_paused and not self.is_stopped:
-            now = self.now()
-            return self._pause_time + now - self._pause_init_time
+        _, _, is_stopped, is_paused, pause_time, pause_init_time = self._snapshot()
+        if is_paused and not is_stopped:
+            return pause_time + self.now() - pause_init_time
         else:
-            return self._pause_time
+            return pause_time
 
     @property
     def total_time(self):
         """Total time (s) since init or reset, stops with timer.stop()."""
-        t = self.now() if not self.is_stopped else self.stop_time
-        return t - self.start_time
+        start_time, stop_time, is_stopped, *_ = self._snapshot()
+        t = self.now() if not is_stopped else stop_time
+        return t - start_time
 
     @property
     def elapsed_time(self):
         """Elapsed time (in s) since init or reset."""
-        return self.total_time - self.pause_time
+        start, stop, is_stopped, is_paused, pause, pause_init = self._snapshot()
+        now = self.now()
+        t = now if not is_stopped else stop
+        if is_paused and not is_stopped:
+            pause += now - pause_init
+        return t - start - pause
 
     @property
     def interval(self):
@@ -193,10 +568,11 @@ class Timer:
         """Choose if interval change is effective immediately or at next checkpt"""
         if value < 0:
             raise ValueError('Timer interval must be positive')
-        self._interval = value
-        if immediate:
-            self._target = self.now() + value
-            self._bypass_checkpt.set()
+        with self._lock:
+            self._interval = value
+            if immediate:
+                self._target = self.now() + value
+                self._bypass_checkpt.set()
 
     @property
     def interval_exceeded(self):
@@ -205,6 +581,21 @@ class Timer:
         else:
             return True
 
+    def fileno(self):
+        """File descriptor readable when checkpt waits are cancelled.
+
+        Only available if the timer is selectable (see Timer()). The file
+        descriptor becomes readable when the timer is stopped, paused, reset
+        or its interval is changed immediately, until the next checkpt.
+        It allows e.g. a selector-based loop to wait for sockets and timer
+        cancellations at the same time, using next_checkpt_release - now()
+        as timeout, and calling checkpt() when the timeout is reached.
+        """
+        try:
+            return self._bypass_checkpt.fileno()
+        except AttributeError:
+            raise ValueError('Timer is not selectable (see selectable option)')
+
     @staticmethod
     def now():
         """Define what is considered as current time"""
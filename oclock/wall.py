@@ -0,0 +1,215 @@
+"""Timer ticking on wall-clock boundaries (e.g. every whole second, minute)."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import time
+import math
+
+from .timer import Timer, Tick
+
+
+max_slew = 500e-6  # max slew rate of the system clock by NTP (s/s)
+
+
+class WallTimer(Timer):
+    """Timer whose checkpts release on wall-clock (unix time) boundaries.
+
+    Releases happen at unix times k * interval + offset (k integer), e.g.
+    every whole second with interval=1, or at :00 of every minute (UTC) with
+    interval=60. Waiting is done with the monotonic clock of Timer, and the
+    offset between wall and monotonic clocks is checked at each checkpt to
+    follow slews and detect steps of the system clock (e.g. NTP corrections);
+    after a step, the timer re-aligns on the next boundary of the new wall
+    time, without firing bursts of checkpts for skipped boundaries.
+    """
+
+    __slots__ = ('offset', 'step_tolerance', 'steps', '_wall_offset', '_k',
+                 '_last_release', '_last_check')
+
+    def __init__(self, interval=1, offset=0, name='WallTimer', warnings=False,
+                 precise=False, selectable=False, step_tolerance=0.001):
+        """Init oclock.WallTimer object.
+
+        Parameters
+        ----------
+        interval : int or float
+            timer interval in seconds (default 1)
+
+        offset : float
+            offset (s) of boundaries with respect to multiples of interval,
+            e.g. interval=60, offset=30 releases at hh:mm:30 (default 0)
+
+        name, warnings, precise, selectable :
+            see oclock.Timer
+
+        step_tolerance : float
+            changes (s) of the offset between wall and monotonic clocks above
+            this value (plus the max NTP slew rate of 500 ppm times the time
+            since last check) are considered as clock steps (default 1 ms)
+        """
+        self.offset = offset
+        self.step_tolerance = step_tolerance
+        self.steps = 0         # number of clock steps detected
+        self._last_check = self.now()
+        self._wall_offset = time.time() - self._last_check
+        self._k = None         # index of last boundary targeted
+        self._last_release = None
+        super().__init__(interval=interval, name=name, warnings=warnings,
+                         precise=precise, selectable=selectable)
+
+    def __repr__(self):
+        """Str representation of WallTimer object"""
+        s = super().__repr__()
+        return s + ", offset {}s, {} clock steps".format(self.offset, self.steps)
+
+    def _next_boundary(self, wall, after_release):
+        """Set target on next wall boundary (call with self._lock acquired)."""
+        interval = self._interval
+        k = math.ceil((wall - self.offset) / interval)
+        if after_release and self._k is not None:
+            k = max(k, self._k + 1)  # no boundary fired twice
+        target = k * interval + self.offset - self._wall_offset
+        # no bursts: releases at least half an interval apart, even if the
+        # clock has been stepped backwards
+        last = self._last_release
+        if last is not None and target - last < interval / 2:
+            k += 1
+            target += interval
+        self._k = k
+        self._target = target
+        self.next_checkpt_release = target
+
+    def _check_clock(self):
+        """Update wall/monotonic offset; return (wall time, True if step)."""
+        now = self.now()
+        wall = time.time()
+        wall_offset = wall - now
+        tolerance = self.step_tolerance + max_slew * (now - self._last_check)
+        step = abs(wall_offset - self._wall_offset) > tolerance
+        self._wall_offset = wall_offset
+        self._last_check = now
+        if step:
+            self.steps += 1
+        return wall, step
+
+    def _start(self):
+        """Start timer (not for public use, call with self._lock acquired)."""
+        super()._start()
+        wall, _ = self._check_clock()
+        self._k = None
+        self._last_release = None
+        self._next_boundary(wall, after_release=False)
+
+    def _before_release(self):
+        """Re-align before waiting if the clock stepped during loop body."""
+        wall, step = self._check_clock()
+        if step and not self.is_paused:
+            with self._lock:
+                self._next_boundary(wall, after_release=False)
+
+    def _after_release(self):
+        """Follow slews and steps, and re-align after overruns / pauses."""
+        if not self.is_stopped:
+            wall, step = self._check_clock()
+            self._last_release = wall - self._wall_offset
+            with self._lock:
+                self._next_boundary(wall, after_release=not step)
+
+    def checkpt(self):
+        """Waits until next wall-clock boundary."""
+        self._before_release()
+        super().checkpt()
+        self._after_release()
+
+    def ticks(self, count=None, duration=None, deadline=None):
+        """Iterate over releases on wall-clock boundaries (see Timer.ticks()).
+
+        Each tick goes through the same release path as checkpt(), so that
+        clock steps are detected and boundaries re-aligned.
+        """
+        now = self.now
+        t_end = float('inf') if deadline is None else deadline
+        if duration is not None:
+            t_end = min(t_end, now() + duration)
+        count = float('inf') if count is None else count
+
+        tick = Tick()
+        index = 0
+
+        while index < count and not self.is_stopped:
+
+            entry = now()
+            if entry >= t_end:
+                return
+
+            self._before_release()
+            paused = self.is_paused
+            with self._lock:
+                scheduled = self._target
+                interval = self._interval
+            if not paused and entry < scheduled and scheduled > t_end:
+                return
+
+            Timer.checkpt(self)
+            release = now()
+            if self.is_stopped:
+                return
+            self._after_release()
+
+            if paused:
+                scheduled = release
+                missed = 0
+            elif entry >= scheduled:
+                missed = int((entry - scheduled) / interval) if interval else 0
+            else:
+                missed = 0
+
+            tick.index = index
+            tick.scheduled = scheduled
+            tick.release = release
+            tick.lateness = release - scheduled
+            tick.missed = missed
+
+            yield tick
+            index += 1
+
+    def checkpt_block(self, size, out=None):
+        """Wait for the end of a block of size ticks on wall-clock boundaries.
+
+        The first tick of the block is the next wall-clock boundary and the
+        following ones are the next boundaries (see Timer.checkpt_block());
+        clock steps are detected between blocks, not within a block.
+        """
+        self._before_release()
+        result = super().checkpt_block(size, out)
+        with self._lock:
+            if self._k is not None:
+                self._k += size - 1   # last boundary of the block
+        self._after_release()
+        return result
+
+    def set_interval(self, value, immediate=True):
+        """Change interval; re-aligns on boundaries of the new interval."""
+        super().set_interval(value, immediate=immediate)
+        if immediate:
+            with self._lock:
+                self._k = None
+                self._next_boundary(time.time(), after_release=False)
@@ -0,0 +1,204 @@
+"""Watchdog detecting timed loops stuck between checkpts (e.g. blocked I/O)."""
+
+# ----------------------------- License information --------------------------
+
+# This file is part of the oclock python package.
+# Copyright (C) 2021 Olivier Vincent
+
+# The oclock package is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# The oclock package is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with the oclock python package.
+# If not, see <https://www.gnu.org/licenses/>
+
+
+import sys
+import traceback
+from threading import Thread, Lock, get_ident
+
+from .timer import Timer
+
+
+# ============================ Heartbeat of a timer ==========================
+
+
+class Heartbeat:
+    """Last checkpt of a timer, updated by the timer itself (timer hook)."""
+
+    __slots__ = ('last_release', 'thread_id', 'max_missed', 'callback',
+                 'stalls', 'is_stalled')
+
+    def __init__(self, timer, max_missed, callback):
+        self.last_release = timer.now()
+        self.thread_id = None    # thread calling checkpt(), known after 1st one
+        self.max_missed = max_missed
+        self.callback = callback
+        self.stalls = 0          # number of stalls detected
+        self.is_stalled = False
+
+    def __call__(self, timer, entry, scheduled, release):
+        """Record checkpt (called by the timer after each checkpt)."""
+        self.last_release = release
+        self.thread_id = get_ident()
+        self.is_stalled = False
+
+
+class Stall:
+    """Information about a loop that has not called checkpt() for too long."""
+
+    def __init__(self, timer, heartbeat, now):
+        self.timer = timer
+        self.name = timer.name
+        self.thread_id = heartbeat.thread_id
+        self.since = heartbeat.last_release   # in the reference of Timer.now()
+        self.duration = now - heartbeat.last_release
+        self.missed = int(self.duration / timer.interval)  # intervals missed
+        self.stack = self._get_stack()
+
+    def __repr__(self):
+        """Str representation of Stall object"""
+        s = "{}, name '{}', stuck for {:.3f}s ({} intervals)" \
+            .format(self.__class__, self.name, self.duration, self.missed)
+        return s
+
+    def _get_stack(self):
+        """Current stack (str) of the stuck thread, None if unknown."""
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return None
+        return ''.join(traceback.format_stack(frame))
+
+
+def print_stall(stall):
+    """Default callback: print warning with stack of the stuck thread."""
+    print("--- Warning, {} stuck for {:.3f}s ({} intervals of {}s)"
+          .format(stall.name, stall.duration, stall.missed, stall.timer.interval))
+    if stall.stack is not None:
+        print(stall.stack, end='')
+
+
+# ============================== Watchdog class ==============================
+
+
+class Watchdog:
+    """Single thread monitoring the checkpts of all registered timers.
+
+    A timer is considered stalled when no checkpt has been released during
+    more than max_missed intervals while the timer is running (paused and
+    stopped timers are ignored). The callback is then called once per stall,
+    from the watchdog thread, with a Stall object containing in particular
+    the stack of the thread stuck in the loop body.
+    """
+
+    def __init__(self, max_missed=2, callback=print_stall, check_interval=None):
+        """Init Watchdog object (monitoring starts with start()).
+
+        Parameters
+        ----------
+        max_missed : int or float
+            default number of intervals without checkpt tolerated per timer
+
+        callback : callable
+            default function called as callback(stall) when a stall is
+            detected, with stall an oclock.watchdog.Stall object
+
+        check_interval : float
+            time (s) between checks; by default, half the smallest interval
+            of the registered timers, so that stalls are detected within
+            one interval.
+        """
+        self.max_missed = max_missed
+        self.callback = callback
+        self.check_interval = check_interval
+        self.timers = {}  # timer: heartbeat
+        self._lock = Lock()
+        self._timer = None
+
+    def __repr__(self):
+        """Str representation of Watchdog object"""
+        s = "{}, max missed {}, timers {}" \
+            .format(self.__class__, self.max_missed,
+                    [timer.name for timer in self.timers])
+        return s
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def register(self, timer, max_missed=None, callback=None):
+        """Monitor checkpts of timer (max_missed, callback: see __init__)."""
+        heartbeat = Heartbeat(timer,
+                              self.max_missed if max_missed is None else max_missed,
+                              self.callback if callback is None else callback)
+        with self._lock:
+            if timer in self.timers:
+                raise ValueError('Timer already registered: {}'.format(timer.name))
+            self.timers[timer] = heartbeat
+        timer.add_hook(heartbeat)
+        return heartbeat
+
+    def unregister(self, timer):
+        """Stop monitoring timer."""
+        with self._lock:
+            heartbeat = self.timers.pop(timer)
+        timer.remove_hook(heartbeat)
+
+    def check(self):
+        """Check all timers once; call callbacks and return list of new stalls."""
+        with self._lock:
+            timers = list(self.timers.items())
+        stalls = []
+        for timer, heartbeat in timers:
+            now = timer.now()
+            if timer.is_stopped or timer.is_paused:
+                heartbeat.last_release = now  # do not count pauses as stalls
+                continue
+            if heartbeat.is_stalled:
+                continue   # already reported
+            if now - heartbeat.last_release > heartbeat.max_missed * timer.interval:
+                heartbeat.is_stalled = True
+                heartbeat.stalls += 1
+                stall = Stall(timer, heartbeat, now)
+                stalls.append(stall)
+                if heartbeat.callback is not None:
+                    heartbeat.callback(stall)
+        return stalls
+
+    def _get_check_interval(self):
+        if self.check_interval is not None:
+            return self.check_interval
+        intervals = [timer.interval for timer in list(self.timers)]
+        return min(intervals) / 2 if intervals else 0.1
+
+    def _run(self):
+        timer = self._timer
+        while not timer.is_stopped:
+            timer.checkpt()
+            if timer.is_stopped:
+                return
+            self.check()
+            interval = self._get_check_interval()
+            if interval != timer.interval:
+                timer.set_interval(interval, immediate=False)
+
+    def start(self):
+        """Start monitoring in a separate (daemon) thread."""
+        self._timer = Timer(interval=self._get_check_interval(),
+                            name='Watchdog')
+        Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        """Stop monitoring thread."""
+        if self._timer is not None:
+            self._timer.stop()
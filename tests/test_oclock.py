@@ -1,12 +1,24 @@
 """Test oclock module with pytest"""
 
+import os
 import time
 import threading
 import random
 
-from oclock.performance import performance_test
-from oclock import Timer, Countdown, loop
+import pytest
+
+from oclock.performance import performance_test, scaling_test
+from oclock.performance import overhead_test, overhead_budget
+from oclock.performance import barrier_skew_test
+from oclock import Timer, Countdown, loop, budgetloop
 from oclock import parse_time, measure_time, measure_duration, after
+from oclock import ControlServer, ControlClient, MetricsExporter, Playback
+from oclock import ClockServer, ClockClient
+from oclock import TickRecorder, read_ticks, Pipeline, Stage
+from oclock.pipeline import BoundedQueue
+from oclock import Executive, WallTimer, Event, FdEvent, Watchdog, PreciseBarrier
+from oclock import Calendar, Scheduler, TokenBucket, LeakyBucket, GCRA
+from oclock import Coalescer, CpuBreakdown
 
 
 def test_timer():
@@ -52,6 +64,824 @@ def test_decorator():
     assert round(timer.pause_time, 1) == dt
 
 
+def test_block_loop():
+    """Test batched ticks: one wakeup per block, contiguous drift-free grid."""
+    import numpy as np
+
+    timer = Timer(interval=1e-4)   # 10 kHz
+    blocks = []
+
+    @loop(timer, block=100)
+    def acquire(timestamps, release):
+        blocks.append(timestamps.copy())
+        assert release >= timestamps[-1]
+        if len(blocks) == 20:
+            timer.stop()
+
+    t0 = time.perf_counter()
+    acquire()
+    assert round(time.perf_counter() - t0, 1) == 0.2
+    timestamps = np.concatenate(blocks)
+    assert len(timestamps) == 2000
+    assert np.allclose(np.diff(timestamps), 1e-4)
+
+
+def _budget_body(budget):
+    """Body of test_budgetloop, at module level to be picklable."""
+    if budget.iterations == 2:
+        time.sleep(0.2)
+
+
+_process_timer = Timer(interval=0.05)
+
+
+@budgetloop(_process_timer, hard='process')
+def _decorated_body(budget):
+    """Body of test_budgetloop_spawn, with decorator syntax at module level."""
+    _budget_body(budget)
+
+
+def test_budgetloop():
+    """Test @budgetloop decorator, with cooperative and hard budgets."""
+    violations = []
+
+    for hard in None, 'thread', 'process':
+        timer = Timer(interval=0.05)
+        remaining = []
+        deadline_shifts = []
+
+        def my_function(budget):
+            remaining.append(budget.remaining())
+            deadline = budget.deadline
+            _budget_body(budget)
+            deadline_shifts.append(budget.deadline - deadline)
+
+        if hard == 'process':
+            my_function = _budget_body
+        my_function = budgetloop(timer, hard=hard,
+                                 on_violation=violations.append)(my_function)
+
+        checkpts = []
+
+        def stop_after_8(timer, entry, scheduled, release):
+            checkpts.append(release)
+            if len(checkpts) == 8:
+                timer.stop()
+
+        timer.add_hook(stop_after_8)
+        my_function()
+        budget = my_function.budget
+        assert budget.iterations == 8
+        assert budget.violations == 1
+        if hard is None:
+            assert 0 < remaining[0] <= 0.05
+        elif hard == 'thread':  # abandoned thread still running: skipped
+            assert budget.skipped >= 2
+            assert not any(deadline_shifts)   # deadline of own iteration
+        else:                   # process terminated at deadline, restarted
+            assert budget.abandoned == 1
+            assert budget.skipped == 0
+
+    assert len(violations) == 3
+
+
+def test_budgetloop_spawn():
+    """Test hard='process' with decorator syntax and spawned processes."""
+    import multiprocessing
+    method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method('spawn', force=True)
+
+    checkpts = []
+
+    def stop_after_4(timer, entry, scheduled, release):
+        checkpts.append(release)
+        if len(checkpts) == 4:
+            timer.stop()
+
+    try:
+        _process_timer.reset()
+        _process_timer.add_hook(stop_after_4)
+        _decorated_body()
+    finally:
+        multiprocessing.set_start_method(method, force=True)
+
+    budget = _decorated_body.budget
+    assert budget.iterations == 4
+    assert budget.violations == budget.abandoned == 1
+
+
+def test_ticks():
+    """Test iteration over timer ticks."""
+    timer = Timer(interval=0.02)
+    indices = []
+    for tick in timer.ticks(count=10):
+        indices.append(tick.index)
+        assert abs(tick.release - tick.scheduled - tick.lateness) < 1e-12
+        if tick.index == 5:
+            time.sleep(0.05)  # exceed interval
+        elif tick.index == 6:
+            assert tick.missed == 1
+        else:
+            assert tick.missed == 0
+    assert indices == list(range(10))
+
+    t0 = time.perf_counter()
+    n = sum(1 for _ in timer.ticks(duration=0.2))
+    assert round(time.perf_counter() - t0, 1) == 0.2
+    assert n in (9, 10, 11)
+
+
+def test_playback(tmp_path):
+    """Test playback of a schedule of trigger times from a file."""
+    import numpy as np
+
+    path = str(tmp_path / 'schedule.npy')
+    np.save(path, np.array([0, 0.1, 0.2, 0.4, 10, 10.1]))
+
+    t0 = time.perf_counter()
+    times = []
+
+    def trigger(i, t):
+        times.append(time.perf_counter() - t0)
+        if i == 3:
+            playback.seek(5)
+
+    playback = Playback(path, trigger, speed=2)
+    playback.run()
+
+    assert len(times) == 5
+    assert np.allclose(times, [0, 0.05, 0.1, 0.2, 0.2], atol=0.01)
+
+    times.clear()
+    schedule = time.time() + np.array([0.05, 0.1])
+    absolute = Playback(schedule, trigger, absolute=True)
+    t0 = time.perf_counter()
+    absolute.start()
+    absolute.join()
+    assert np.allclose(times, [0.05, 0.1], atol=0.01)
+
+    times.clear()   # relative schedule not starting at 0
+    t0 = time.perf_counter()
+    Playback([0.1, 0.15], trigger).run()
+    assert np.allclose(times, [0.1, 0.15], atol=0.01)
+
+
+def test_recorder(tmp_path):
+    """Test recording of checkpts and measurements in a binary file."""
+    path = str(tmp_path / 'ticks.bin')
+    timer = Timer(interval=0.01)
+
+    with TickRecorder(path, capacity=4, flush_interval=0.05) as recorder:
+        recorder.attach(timer)
+        for _ in range(10):
+            timer.checkpt()
+        recorder.detach(timer)
+        with measure_time(recorder=recorder) as timing:
+            time.sleep(0.01)
+        assert recorder.capacity == 16
+
+    with TickRecorder(path) as recorder:   # appends to existing file
+        recorder.attach(timer)
+        timer.checkpt()
+        recorder.close()   # detaches timer, and can be called again
+    assert not timer._hooks
+
+    ticks = read_ticks(path)
+    assert len(ticks) == 12
+    assert all(ticks['flags'][:10] & TickRecorder.CHECKPT)
+    assert ticks['flags'][10] == TickRecorder.MEASUREMENT
+    assert round(ticks['duration_ns'][10] * 1e-9, 2) == 0.01
+    assert abs(ticks['time_ns'][10] * 1e-9 - timing['time (unix)']) < 1e-6
+    assert ticks['flags'][11] & TickRecorder.CHECKPT
+    assert (ticks['lateness_ns'][:10] >= 0).all()
+    assert (ticks['time_ns'][1:] > ticks['time_ns'][:-1]).all()
+    span = (ticks['time_ns'][9] - ticks['time_ns'][0]) * 1e-9   # 9 intervals
+    assert 0.06 < span < 0.12
+
+
+def _consume_in_process(times, samples):
+    """Consumer for test_pipeline (must be picklable)."""
+    pass
+
+
+def test_pipeline():
+    """Test acquisition pipeline with fast and slow consumers."""
+    queue = BoundedQueue(maxsize=2, policy='drop_oldest')
+    for i in range(4):
+        queue.put(i)
+    assert queue.get_batch(5, timeout=0.01) == [2, 3]
+    assert queue.dropped == 2
+
+    batches = []
+
+    def store(times, samples):
+        batches.append(samples)
+
+    def process(times, samples):
+        time.sleep(0.1)
+
+    stages = [Stage(store, batch_size=5),
+              Stage(process, maxsize=2, policy='drop_newest'),
+              Stage(_consume_in_process, batch_size=10, processes=True)]
+
+    timer = Timer(interval=0.01)
+    counter = iter(range(1000))
+    pipeline = Pipeline(timer, lambda: next(counter), stages)
+    pipeline.start()
+    time.sleep(0.3)
+    pipeline.stop()
+
+    stats = pipeline.stats()
+    n = stats['source']['samples']
+    assert 25 <= n <= 32
+    assert stats['store']['samples'] == n
+    assert list(batches[0]) == [0, 1, 2, 3, 4]
+    assert stats['process']['dropped'] > 0
+    assert stats['process']['samples'] + stats['process']['dropped'] == n
+    assert stats['_consume_in_process']['samples'] == n
+
+
+def test_pipeline_errors():
+    """Test that failing consumers neither stall the pipeline nor stop()."""
+    def bad(times, samples):
+        raise RuntimeError('consumer failure')
+
+    def slow(times, samples):
+        time.sleep(0.2)
+
+    stages = [Stage(bad, maxsize=5, policy='block'),
+              Stage(slow, maxsize=1, policy='block')]
+    timer = Timer(interval=0.01)
+    pipeline = Pipeline(timer, lambda: 0, stages)
+    pipeline.start()
+    time.sleep(0.3)
+    t0 = time.perf_counter()
+    pipeline.stop()   # producer blocked in put() by the slow stage
+    assert time.perf_counter() - t0 < 1
+
+    stats = pipeline.stats()
+    assert stats['bad']['errors'] == stats['bad']['batches'] > 0
+    assert stats['slow']['errors'] == 0
+
+
+def test_executive():
+    """Test multi-rate executive with phase-aligned and offloaded tasks."""
+    executive = Executive(interval=0.01)
+    frames = {'fast': [], 'slow': [], 'offset': []}
+
+    def record(name):
+        frames[name].append(executive.frame)
+
+    executive.add_task(record, divider=10, args=('slow',), name='slow')
+    executive.add_task(record, divider=1, args=('fast',), name='fast')
+    executive.add_task(record, divider=5, offset=2, args=('offset',),
+                       name='offset')
+    executive.add_task(time.sleep, divider=2, offload=True, args=(0.03,),
+                       name='offloaded')
+
+    assert [task.name for task in executive.tasks] == \
+        ['fast', 'offloaded', 'offset', 'slow']
+
+    executive.start()
+    time.sleep(0.255)
+    executive.stop()
+
+    n = len(frames['fast'])
+    assert 24 <= n <= 26
+    assert frames['fast'] == list(range(n))
+    assert frames['slow'] == list(range(0, n, 10))
+    assert frames['offset'] == list(range(2, n, 5))
+
+    stats = executive.stats()
+    assert stats['offloaded']['overruns'] > 0
+    assert stats['offloaded']['runs'] + stats['offloaded']['skipped'] == \
+        len(range(0, n, 2))
+
+
+def test_calendar_scheduler():
+    """Test calendar specs and dispatch of jobs, incl. missed runs."""
+    from datetime import datetime, timedelta
+
+    monday = datetime(2021, 3, 1, 17, 50)
+    calendar = Calendar('every :15: between 8:: and 18:: on weekdays')
+    assert calendar.upcoming(3, after=monday) == [
+        datetime(2021, 3, 1, 18), datetime(2021, 3, 2, 8),
+        datetime(2021, 3, 2, 8, 15)]
+    friday = datetime(2021, 3, 5, 3)
+    assert Calendar('at 2:30: daily on mon').next_after(friday) == \
+        datetime(2021, 3, 8, 2, 30)
+    assert Calendar('at 8::,2:30:').next_after(friday) == datetime(2021, 3, 5, 8)
+
+    scheduler = Scheduler(tolerance=0.05, check_interval=0.1)
+    runs = {'fast': 0, 'skip': 0, 'run_once': 0, 'run_all': 0}
+
+    def count(name):
+        runs[name] += 1
+
+    scheduler.add('every ::0.1', count, args=('fast',))
+    past = datetime.now() - timedelta(hours=5)   # e.g. after suspend
+    for policy in 'skip', 'run_once', 'run_all':
+        scheduler.add('every 1::', count, args=(policy,), name=policy,
+                      missed=policy, start=past)
+    scheduler.start()
+    time.sleep(0.55)
+    scheduler.stop()
+
+    assert 4 <= runs['fast'] <= 6
+    assert runs['skip'] == 0
+    assert runs['run_once'] == 1
+    assert runs['run_all'] == 5
+    assert scheduler.stats()['skip']['missed'] == 5
+
+
+def test_rate_limiters():
+    """Test bursts, pacing across threads, async and cancellation."""
+    import asyncio
+
+    for limiter in TokenBucket(100, burst=10), GCRA(100, burst=10, precise=True):
+        assert all(limiter.try_acquire() for _ in range(10))
+        assert not limiter.try_acquire()
+        assert not limiter.acquire(5, timeout=0.01)
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=limiter.acquire, args=(2,))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert round(time.perf_counter() - t0, 2) == 0.1
+        assert limiter.acquired == 20
+
+    limiter = LeakyBucket(100, capacity=3, precise=True)
+    t0 = time.perf_counter()
+    times = []
+    for _ in range(3):
+        limiter.acquire()
+        times.append(time.perf_counter() - t0)
+    assert [round(t, 2) for t in times] == [0, 0.01, 0.02]
+    assert limiter.acquire(2) and not limiter.try_acquire(2)  # overflow
+
+    limiter = LeakyBucket(100)
+
+    async def acquire_many():
+        for _ in range(5):
+            await limiter.acquire_async()
+    t0 = time.perf_counter()
+    asyncio.run(acquire_many())
+    assert 0.035 < time.perf_counter() - t0 < 0.06   # asyncio sleep precision
+
+    limiter = GCRA(1)
+    limiter.acquire()
+    threading.Timer(0.05, limiter.close).start()
+    assert not limiter.acquire()
+
+    limiter = GCRA(1)   # cancellation of async waits
+    limiter.acquire()
+    threading.Timer(0.05, limiter.close).start()
+    t0 = time.perf_counter()
+    assert not asyncio.run(limiter.acquire_async())
+    assert time.perf_counter() - t0 < 0.5
+
+
+def test_runner():
+    """Test periodic command runner (persistent shell, callables, overruns)."""
+    import io
+    import json
+    from oclock.runner import Runner
+
+    output = io.StringIO()
+    runner = Runner('echo $$', interval=0.02, persistent=True, output=output)
+    runner.run(count=5)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r['tick'] for r in records] == list(range(5))
+    assert all(r['status'] == 0 for r in records)
+    assert len({r['output'] for r in records}) == 1   # same shell process
+    assert all(abs(r['lateness']) < 0.01 for r in records)
+
+    output = io.StringIO()
+    runner = Runner(lambda: time.sleep(0.05), interval=0.02, output=output)
+    runner.run(count=6)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert runner.skipped == len([r for r in records if 'skipped' in r]) > 0
+
+    output = io.StringIO()
+    runner = Runner('sleep 1', interval=0.05, overrun='kill', output=output)
+    t0 = time.perf_counter()
+    runner.run(count=2)
+    assert time.perf_counter() - t0 < 1.5   # first execution killed
+    assert json.loads(output.getvalue().splitlines()[0])['status'] == -9
+
+
+def test_wall_timer(monkeypatch):
+    """Test alignment of WallTimer on wall-clock boundaries and clock steps."""
+    timer = WallTimer(interval=0.1, offset=0.05)
+
+    def phase():
+        """Distance (s) to closest boundary"""
+        dt = (time.time() - 0.05) % 0.1
+        return min(dt, 0.1 - dt)
+
+    for _ in range(5):
+        timer.checkpt()
+        assert abs(phase()) < 0.005
+
+    unix_time = time.time
+    monkeypatch.setattr(time, 'time', lambda: unix_time() + 3600.03)
+    t0 = time.perf_counter()
+    for _ in range(3):
+        timer.checkpt()
+        assert abs(phase()) < 0.005
+    assert timer.steps == 1
+    assert time.perf_counter() - t0 > 0.25   # no burst
+
+    for tick in timer.ticks(count=4):   # same alignment and step handling
+        assert abs(phase()) < 0.005
+        if tick.index == 1:
+            monkeypatch.setattr(time, 'time', lambda: unix_time() + 0.03)
+    assert timer.steps == 2
+
+    import numpy as np
+    last = None
+    for _ in range(3):   # blocks of ticks on consecutive boundaries
+        times, release = timer.checkpt_block(4)
+        assert abs(phase()) < 0.005
+        assert np.allclose(np.diff(times), 0.1)
+        if last is not None:
+            assert round(times[0] - last, 3) == 0.1
+        last = times[-1]
+
+    t_at = time.time() + 0.2
+    result = after(at=t_at, function=time.time)
+    assert 0 <= result - t_at < 0.005
+
+
+def test_fd_event():
+    """Test file-descriptor based event with selectors, asyncio and Timer."""
+    import asyncio
+    import selectors
+
+    with FdEvent() as event:
+        assert not event.wait(0.01)
+        threading.Timer(0.05, event.set).start()
+        with selectors.DefaultSelector() as selector:
+            selector.register(event, selectors.EVENT_READ)
+            assert len(selector.select(timeout=1)) == 1
+            event.clear()
+            assert selector.select(timeout=0.01) == []
+        assert not event.is_set()
+
+        async def wait_for_event():
+            asyncio.get_running_loop().call_later(0.05, event.set)
+            return await asyncio.wait_for(event.wait_async(), timeout=1)
+
+        assert asyncio.run(wait_for_event())
+
+    timer = Timer(interval=0.02, selectable=True)
+    timer.checkpt()
+    threading.Timer(0.05, timer.stop).start()
+    with selectors.DefaultSelector() as selector:
+        selector.register(timer, selectors.EVENT_READ)
+        while not selector.select(timeout=timer.next_checkpt_release - timer.now()):
+            timer.checkpt()
+    assert timer.is_stopped
+
+
+def test_watchdog():
+    """Test detection of a loop stuck in its body, with stack of thread."""
+    stalls = []
+    timer = Timer(interval=0.02)
+    release = threading.Event()
+
+    def stuck_body():
+        release.wait()
+
+    def run():
+        for i in range(5):
+            timer.checkpt()
+            if i == 2:
+                stuck_body()
+        timer.stop()
+
+    with Watchdog(max_missed=3, callback=stalls.append) as watchdog:
+        watchdog.register(timer)
+        thread = threading.Thread(target=run)
+        thread.start()
+        time.sleep(0.3)
+        release.set()
+        thread.join()
+
+    assert len(stalls) == 1
+    assert stalls[0].missed >= 3
+    assert 'stuck_body' in stalls[0].stack
+    assert watchdog.timers[timer].stalls == 1
+
+
+def test_barrier():
+    """Test release of threads at a common deadline (reusable barrier)."""
+    for spin_all in False, True:
+        barrier = PreciseBarrier(4, spin_all=spin_all)
+        for _ in range(3):
+            releases = []
+            deadline = time.perf_counter() + 0.02
+            threads = [threading.Thread(
+                target=lambda: releases.append(barrier.wait(deadline)))
+                for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert len(releases) == 4
+            assert min(releases) >= deadline
+            assert max(releases) - deadline < 0.01
+            assert barrier.n_waiting == 0
+
+    results = barrier_skew_test(nthreads=(2, 8), repeat=5)
+    assert set(results) == {2, 8}
+
+
+def test_event_set_clear():
+    """Test that set() wakes up waiters even if followed by clear()."""
+    event = Event()
+    errors = []
+    t_end = time.perf_counter() + 0.5
+
+    def wait():
+        while time.perf_counter() < t_end:
+            event.wait(0.005)
+
+    def set_clear():
+        try:
+            while time.perf_counter() < t_end:
+                event.set()
+                event.clear()
+                time.sleep(0.0005)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=f) for f in (wait,) * 4 + (set_clear,) * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+    # reset() sets then clears the bypass event
+    for kwargs in ({'precise': True},) * 5 + ({'selectable': True},) * 5:
+        timer = Timer(interval=0.5, **kwargs)
+        threading.Timer(0.05, timer.reset).start()
+        t0 = time.perf_counter()
+        timer.checkpt()
+        assert time.perf_counter() - t0 < 0.3
+
+
+def test_thread_safety():
+    """Stress Timer and Event state transitions from many threads."""
+    timer = Timer(interval=0.001, precise=True)
+    errors = []
+    t_end = time.perf_counter() + 0.5
+
+    def control():
+        try:
+            while time.perf_counter() < t_end:
+                method = random.choice((timer.pause, timer.resume,
+                                        timer.reset, timer.resume))
+                method()
+                timer.set_interval(random.choice((0.001, 0.002)))
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        try:
+            while time.perf_counter() < t_end:
+                assert timer.pause_time >= 0
+                assert timer.elapsed_time >= 0
+        except Exception as e:
+            errors.append(e)
+
+    def run():
+        try:
+            while not timer.is_stopped:
+                timer.checkpt()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=f) for f in (control,) * 4 + (read,) * 4]
+    runner = threading.Thread(target=run)
+    for thread in threads + [runner]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    timer.stop()
+    runner.join(timeout=1)
+
+    assert not runner.is_alive()
+    assert not errors
+
+
+def test_scaling():
+    """Test that scaling benchmark runs (scaling itself needs no-GIL build)."""
+    results = scaling_test(nthreads=(1, 2), ntimers=2, duration=0.1)
+    assert all(rate > 0 for rate in results.values())
+
+
+@pytest.mark.skipif(not os.environ.get('OCLOCK_OVERHEAD_TEST'),
+                    reason='absolute timings depend on machine and load, '
+                           'set OCLOCK_OVERHEAD_TEST=1 to run')
+def test_overhead():
+    """Test that hot-path operations stay within their overhead budget."""
+    overhead_test(budget=overhead_budget)
+
+
+def test_control_server(tmp_path):
+    """Test control of several timers through a ControlServer."""
+    t1 = Timer(interval=0.1, name='t1')
+    t2 = Timer(interval=0.1, name='t2')
+
+    for address in str(tmp_path / 'oclock.sock'), '127.0.0.1:0':
+        with ControlServer(address) as server:
+            server.register(t1)
+            server.register(t2)
+            with ControlClient(server.address) as client:
+                assert client.list() == ['t1', 't2']
+                assert client.send('t1', 'p') == '--- Timer Paused'
+                assert t1.is_paused and not t2.is_paused
+                assert client.send('t1', 'status').startswith('[t1] [paused]')
+                assert client.send('*', 'r').count('Resumed') == 2
+                assert client.send('t2', '0.5').endswith('0.5')
+                assert t2.interval == 0.5
+                assert client.send('t3', 'p').startswith('--- Unknown')
+                assert client.send('t2', 'xyz') == '--- Invalid Command'
+                client._socket.sendall(b'\xff\xfe a p\n')   # invalid utf-8
+                assert client._file.readline().startswith('---')
+                assert client.list() == ['t1', 't2']
+                with pytest.raises(ValueError):
+                    server.register(Timer(name='t1'))
+                server.unregister('t1', t2)   # t1 not registered for t2
+                assert client.list() == ['t1', 't2']
+                client.send('*', 'stop')
+        assert t1.is_stopped and t2.is_stopped
+        t1.reset()
+        t2.reset()
+
+
+def test_clock_sync(tmp_path):
+    """Test offset/drift estimation with a simulated peer clock."""
+    import numpy as np
+
+    t0 = time.time_ns()
+
+    def peer_clock():   # 5 ms ahead, 1000 ppm fast
+        t = time.time_ns()
+        return t + 5_000_000 + (t - t0) // 1000
+
+    with ClockServer(clock=peer_clock) as server, \
+            ClockClient(server.address) as client:
+        for _ in range(10):
+            client.sync()
+            time.sleep(0.02)
+        t = time.time() + np.arange(5)
+        expected = t + 5e-3 + (t - t0 * 1e-9) * 1e-3
+        assert np.allclose(client.to_peer(t), expected, rtol=0, atol=1e-4)
+        assert np.allclose(client.from_peer(client.to_peer(t)), t, rtol=0, atol=1e-6)
+        assert abs(client.drift - 1e-3) < 1e-4
+        assert client.uncertainty < 1e-3
+
+    path = str(tmp_path / 'clock.sock')
+    with ClockServer(path) as server, ClockClient(path) as client:
+        # probe from a client that disappears before the reply
+        gone = ClockClient(path)
+        gone._socket.sendto(b'\x00' * 16, path)
+        gone.close()
+        time.sleep(0.05)
+        assert abs(client.sync()) < 1e-3
+        assert server.probes == 8
+
+
+def test_coalescing():
+    """Test coalescing of wakeups of timers with slack."""
+    coalescer = Coalescer()
+    timers = []
+    for _ in range(10):   # scheduled times staggered by 2 ms
+        timers.append(Timer(interval=0.05, slack=0.02, coalescer=coalescer))
+        time.sleep(0.002)
+    schedules = []
+
+    def run(timer):
+        scheduled = [tick.scheduled for tick in timer.ticks(count=10)]
+        schedules.append(scheduled)
+
+    threads = [threading.Thread(target=run, args=(timer,)) for timer in timers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for scheduled in schedules:   # grids not affected by coalescing
+        intervals = [t2 - t1 for t1, t2 in zip(scheduled, scheduled[1:])]
+        assert max(abs(dt - 0.05) for dt in intervals) < 1e-9
+
+    stats = coalescer.stats()
+    assert stats['released'] == 100
+    assert stats['wakeups_saved'] >= 50
+    assert 0 < stats['mean_lateness'] < stats['max_lateness'] < 0.03
+
+    timer = timers[0]   # waits on the coalescer can be cancelled
+    timer.set_interval(1)
+    timer.checkpt()
+    threading.Timer(0.05, timer.stop).start()
+    t0 = time.perf_counter()
+    timer.checkpt()
+    assert time.perf_counter() - t0 < 0.5
+    assert not coalescer._pending
+
+
+def test_cpu_breakdown():
+    """Test wall vs CPU time of loop bodies and attribution of overruns."""
+    timer = Timer(interval=0.02)
+    breakdown = CpuBreakdown(rusage=True)
+    timer.add_hook(breakdown)
+
+    def spin(duration):
+        t0 = time.perf_counter()
+        while time.perf_counter() < t0 + duration:
+            pass
+
+    timer.checkpt()
+    for body in (spin, spin, time.sleep, time.sleep):
+        body(0.03)  # overrun
+        timer.checkpt()
+        timer.checkpt()
+
+    stats = breakdown.stats()
+    assert stats['ticks'] == 8
+    assert stats['overruns'] == 4
+    causes = stats['overrun causes']   # spinning can be preempted if busy CPU
+    assert causes['cpu'] + causes['scheduling'] == 2
+    assert causes['waiting'] == 2
+    assert 0 < stats['cpu fraction'] < 0.7
+    assert stats['voluntary switches'] >= 2
+
+    # the busy-wait of precise timers is not charged to loop bodies
+    for precise in False, True:
+        timer = Timer(interval=0.005, precise=precise)
+        breakdown = CpuBreakdown()
+        timer.add_hook(breakdown)
+        for _ in range(20):
+            time.sleep(0.001)
+            timer.checkpt()
+        assert breakdown.stats()['cpu fraction'] < 0.5
+        timer.remove_hook(breakdown)
+        assert not timer._entry_hooks
+
+    with measure_duration(cpu=True) as duration:
+        time.sleep(0.05)
+        spin(0.05)
+    assert 0 < duration['thread cpu (s)'] < 0.07
+    assert duration['process cpu (s)'] >= duration['thread cpu (s)']
+
+
+def test_metrics(tmp_path):
+    """Test collection and exposition of timer metrics."""
+    from urllib.request import urlopen
+
+    timer = Timer(interval=0.02, name='acq')
+    exporter = MetricsExporter()
+    stats = exporter.register(timer)
+
+    for _ in range(10):
+        timer.checkpt()
+    time.sleep(0.05)
+    timer.checkpt()   # overrun
+
+    assert stats.ticks == 11
+    assert stats.overruns == 1
+
+    host, port = exporter.serve(port=0)
+    with urlopen('http://{}:{}/metrics'.format(host, port)) as response:
+        text = response.read().decode()
+    exporter.shutdown()
+
+    assert 'oclock_timer_ticks_total{timer="acq"} 11' in text
+    assert 'oclock_timer_lateness_seconds_bucket{timer="acq",le="+Inf"} 11' in text
+
+    path = tmp_path / 'oclock.prom'
+    exporter.write_textfile(str(path))
+    assert 'oclock_timer_overruns_total{timer="acq"} 1' in path.read_text()
+
+    exporter.unregister('acq')
+    assert not timer._hooks
+
+    exporter = MetricsExporter(cpu=True)
+    exporter.register(timer)
+    for _ in range(3):
+        timer.checkpt()
+    text = exporter.render()
+    assert 'oclock_timer_body_cpu_seconds_total{timer="acq"}' in text
+    assert 'oclock_timer_overruns_by_cause_total{timer="acq",cause="cpu"} 0' in text
+    exporter.unregister('acq')
+    assert not timer._hooks
+
+
 def test_parse():
     """Test parsing of time strings."""
     t1 = parse_time('::5')
@@ -89,6 +919,22 @@ def test_after():
     assert result == 3.14
 
 
+def test_terminal_countdown():
+    """Test terminal countdown from the command line (no tkinter needed)."""
+    import signal
+    import subprocess
+    import sys
+
+    process = subprocess.Popen([sys.executable, '-m', 'oclock', '::2', '-t'],
+                               stdout=subprocess.PIPE)
+    time.sleep(3.5)
+    process.send_signal(signal.SIGINT)
+    output, _ = process.communicate(timeout=5)
+    updates = output.decode().split('\r\033[K')[1:]
+    assert updates == ['0:00:02', '0:00:01', 'Done!\a\n']
+    assert process.returncode == 0
+
+
 def test_countdown():
     """Test interactive countdown."""
     countdown = Countdown('::5')